@@ -1,164 +1,229 @@
-import operator
-import random
-import math
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from deap import base, creator, tools, gp
-from deap import algorithms
+from deap import tools
+from classified_counts import load_classified_counts, normalize
+from traffic_gp import build_toolbox, build_stats, compile_vectorized, init_worker, create_pool, FitnessCache
+from traffic_gp import COMPLEXITY_PENALTY, MAX_TREE_HEIGHT
+from gp_islands import run_islands
+from gp_evolution import evolve, load_checkpoint
+from results_store import ResultsStore
 from sklearn.model_selection import train_test_split
-import csv
+import argparse
 import os
+import random
+from datetime import datetime
+from functools import partial
 
+# Default classified-count export; --data also accepts a directory or glob of daily files
+DEFAULT_DATA_PATH = r"C:\Users\brian\Downloads\classified-counts_from_2024-11-11_to_2024-11-11.csv"
 
-# Step 1: Load the dataset
-file_path = r"C:\Users\brian\Downloads\classified-counts_from_2024-11-11_to_2024-11-11.csv"
-data = pd.read_csv(file_path)
-
-# Step 2: Inspect the dataset
-print("Columns in dataset:", data.columns.tolist())  # Debug: List all columns
-print("Sample data from dataset:")
-print(data.head())  # Debug: Show the first few rows
-
-# Step 3: Filter and pair data
-if 'direction' not in data.columns or 'Car' not in data.columns:
-    raise ValueError("Dataset must include 'direction' and 'Car' columns.")
-
-# Separate inbound and outbound data
-inbound_data = data[data['direction'] == 'in']['Car'].reset_index(drop=True)
-outbound_data = data[data['direction'] == 'out']['Car'].reset_index(drop=True)
-
-if len(inbound_data) != len(outbound_data):
-    raise ValueError("Mismatch in the number of 'in' and 'out' rows.")
-
-# Normalize data
-inbound_data = (inbound_data - inbound_data.mean()) / inbound_data.std()
-outbound_data = (outbound_data - outbound_data.mean()) / outbound_data.std()
-
-# Train-test split
-inbound_train, inbound_val, outbound_train, outbound_val = train_test_split(
-    inbound_data, outbound_data, test_size=0.2, random_state=42
-)
-
-data_pairs_train = list(zip(inbound_train, outbound_train))
-data_pairs_val = list(zip(inbound_val, outbound_val))
-print(f"Number of training data pairs: {len(data_pairs_train)}")
-
-# Step 4: Define custom evaluation function
-def custom_evaluate(individual, data_pairs):
-    func = toolbox.compile(expr=individual)
-    errors = [(func(inbound) - outbound) ** 2 for inbound, outbound in data_pairs]
-    rmse = np.sqrt(sum(errors) / len(errors))
-    complexity_penalty = len(individual) * 0.005  # Penalize tree complexity
-    return rmse + complexity_penalty,  # Penalized RMSE
+# "vectorized" scores each tree over whole NumPy arrays, "scalar" calls it once per data pair
+EVALUATION_MODE = "vectorized"
 
 def calculate_percentage_error(predictions, actuals):
     errors = [(abs(pred - actual) / abs(actual)) * 100 for pred, actual in zip(predictions, actuals)]
     avg_error = sum(errors) / len(errors)
     return avg_error
 
-def safe_div(x, y):
-    return x / y if y != 0 else 1
-
-def safe_log(x):
-    return math.log(x) if x > 0 else 0
-
-# Step 5: Define genetic programming components
-pset = gp.PrimitiveSet("MAIN", 1)  # 1 input: inbound vehicles
-pset.addPrimitive(operator.add, 2)
-pset.addPrimitive(operator.sub, 2)
-pset.addPrimitive(operator.mul, 2)
-pset.addPrimitive(operator.neg, 1)
-pset.addPrimitive(safe_div, 2)
-pset.addPrimitive(safe_log, 1)
-pset.addEphemeralConstant("rand", lambda: random.uniform(-0.5, 0.5))
-pset.renameArguments(ARG0="inbound_vehicles")
-creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-creator.create("Individual", gp.PrimitiveTree, fitness=creator.FitnessMin)
-
-toolbox = base.Toolbox()
-toolbox.register("expr", gp.genHalfAndHalf, pset=pset, min_=1, max_=3)
-toolbox.register("individual", tools.initIterate, creator.Individual, toolbox.expr)
-toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-toolbox.register("compile", gp.compile, pset=pset)
-toolbox.register("evaluate", custom_evaluate, data_pairs=data_pairs_train)
-toolbox.register("select", tools.selTournament, tournsize=3)
-toolbox.register("mate", gp.cxOnePoint)
-toolbox.register("expr_mut", gp.genFull, min_=2, max_=4)
-toolbox.register("mutate", gp.mutUniform, expr=toolbox.expr_mut, pset=pset)
-
-# Step 6: Configure and run the genetic programming evolution process
-population = toolbox.population(n=500)
-hof = tools.HallOfFame(1)
-stats = tools.Statistics(lambda ind: ind.fitness.values)
-stats.register("avg", np.mean)
-stats.register("std", np.std)
-stats.register("min", np.min)
-stats.register("max", np.max)
-
-_, logbook = algorithms.eaSimple(
-    population, toolbox, cxpb=0.7, mutpb=0.2, ngen=150, stats=stats, halloffame=hof, verbose=True
-)
-
-# Step 7: Extract generation and minimum fitness values for plotting
-gen = logbook.select("gen")
-min_fitness_values = logbook.select("min")
-
-# Plot fitness progression
-plt.figure(figsize=(10, 6))
-plt.plot(gen, min_fitness_values, label="Best Fitness (Min)", marker='o')
-plt.xlabel("Generation")
-plt.ylabel("Fitness (RMSE)")
-plt.title("Fitness Progression Over Generations")
-plt.legend()
-plt.grid()
-plt.show()
-
-# Step 8: Display the best evolved model
-best_individual = hof[0]
-print("Best individual:", best_individual)
-print("Best training fitness (RMSE):", custom_evaluate(best_individual, data_pairs_train)[0])
-
-# File path to store RMSE results
-output_file = "rmse_results.csv"
-
-# Check if the file already exists to determine if the header should be written
-file_exists = os.path.isfile(output_file)
-
-# Append RMSE values to the CSV file
-with open(output_file, "a", newline="") as csvfile:
-    writer = csv.writer(csvfile)
-    
-    # Write header only if the file is new
-    if not file_exists:
-        writer.writerow(["Run", "Generation", "RMSE"])  # Header
-    
-    # Identify the current run number
-    current_run = sum(1 for _ in open(output_file)) // len(gen) if file_exists else 1
-    
-    # Write data for the current run
-    for g, rmse in zip(gen, min_fitness_values):
-        writer.writerow([f"Run {current_run}", g, rmse])
-
-print(f"RMSE values for Run {current_run} appended to {output_file}")
-
-# Validate the model
-func = toolbox.compile(expr=best_individual)
-predictions = [func(inv) for inv in inbound_val]
-val_rmse = np.sqrt(np.mean([(pred - actual) ** 2 for pred, actual in zip(predictions, outbound_val)]))
-print("Validation RMSE:", val_rmse)
-
-# Calculate percentage error
-percentage_error = calculate_percentage_error(predictions, outbound_val)
-print("Validation Percentage Error:", percentage_error, "%")
-
-
-plt.figure(figsize=(10, 6))
-plt.axhline(y=1, color='red', linestyle='--', label="1% Target")
-plt.plot(range(len(predictions)), [abs(pred - actual) for pred, actual in zip(predictions, outbound_val)], label="Error", marker='o', linestyle='-', color='blue')
-plt.xlabel("Data Points")
-plt.ylabel("Error")
-plt.title("Prediction Errors on Validation Data")
-plt.legend()
-plt.grid()
-plt.show()
+def validation_rmse(individual, inbound, outbound):
+    func = compile_vectorized(individual)
+    with np.errstate(all="ignore"):
+        return float(np.sqrt(np.mean((func(inbound) - outbound) ** 2))),
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evolve a GP model of outbound from inbound traffic counts.")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH,
+                        help="Classified-count CSV file, directory of CSV files or glob pattern")
+    parser.add_argument("--chunksize", type=int, default=100000,
+                        help="Rows read per chunk while streaming the count files")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed (a random one is drawn and recorded when omitted)")
+    parser.add_argument("--results", default="gp_results.sqlite",
+                        help="SQLite database the run, its per-generation stats and validation metrics are written to")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of evaluation processes (1 evaluates serially in this process; "
+                             "defaults to the number of CPUs)")
+    parser.add_argument("--cache-size", type=int, default=50000,
+                        help="Maximum number of distinct trees kept in the fitness cache")
+    parser.add_argument("--generations", type=int, default=150,
+                        help="Maximum number of generations")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="Stop after this many generations without the best fitness improving")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Stop once the evolution has run for this many seconds")
+    parser.add_argument("--target-rmse", type=float, default=None,
+                        help="Stop once the best (penalized) RMSE reaches this value")
+    parser.add_argument("--checkpoint", default=None,
+                        help="File to save the evolution state to periodically (single-population mode)")
+    parser.add_argument("--checkpoint-every", type=int, default=10,
+                        help="Generations between checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="Carry on from --checkpoint if it exists instead of starting from generation 0")
+    parser.add_argument("--max-height", type=int, default=MAX_TREE_HEIGHT,
+                        help="Offspring taller than this are replaced by a parent")
+    parser.add_argument("--max-size", type=int, default=None,
+                        help="Offspring with more nodes than this are replaced by a parent")
+    parser.add_argument("--selection", choices=["tournament", "double_tournament"], default="tournament",
+                        help="Plain fitness tournament, or double tournament with a tree-size stage")
+    parser.add_argument("--parsimony-size", type=float, default=1.4,
+                        help="Size tournament strength for double_tournament selection (1 to 2)")
+    parser.add_argument("--parsimony", type=float, default=COMPLEXITY_PENALTY,
+                        help="Fitness penalty per tree node")
+    parser.add_argument("--population", type=int, default=500,
+                        help="Population size (per island in island mode)")
+    parser.add_argument("--islands", type=int, default=1,
+                        help="Number of sub-populations evolved in separate processes (1 disables the island model)")
+    parser.add_argument("--migration-interval", type=int, default=10,
+                        help="Generations between migrations in island mode")
+    parser.add_argument("--migrants", type=int, default=5,
+                        help="Best individuals each island sends to the next one per migration")
+    args = parser.parse_args()
+
+    if args.islands > 1:
+        # Islands always run for --generations and evaluate inside their own processes
+        single_population_only = {
+            "--patience": args.patience, "--time-budget": args.time_budget, "--target-rmse": args.target_rmse,
+            "--checkpoint": args.checkpoint, "--resume": args.resume or None, "--workers": args.workers,
+        }
+        used = [flag for flag, value in single_population_only.items() if value is not None]
+        if used:
+            parser.error(f"{', '.join(used)} cannot be used with --islands > 1")
+    if args.workers is None:
+        args.workers = os.cpu_count()
+    return args
+
+def main():
+    args = parse_args()
+    started_at = datetime.now().isoformat(timespec="seconds")
+    resuming = args.resume and args.checkpoint and os.path.exists(args.checkpoint)
+    if resuming:
+        # The checkpoint restores the RNG state, so the seed and start time recorded are those of the original run
+        metadata = load_checkpoint(args.checkpoint).get("metadata", {})
+        args.seed = metadata.get("seed", args.seed)
+        started_at = metadata.get("started_at", started_at)
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 31)
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    # Step 5: Define genetic programming components (primitive set and operators live in traffic_gp.py)
+    toolbox_options = dict(max_height=args.max_height, max_size=args.max_size,
+                           selection=args.selection, parsimony_size=args.parsimony_size)
+    toolbox = build_toolbox(**toolbox_options)
+
+    # Step 1-3: Stream the inbound/outbound car counts from the dataset
+    inbound_data, outbound_data = load_classified_counts(args.data, chunksize=args.chunksize)
+
+    # Normalize data
+    inbound_data = normalize(inbound_data)
+    outbound_data = normalize(outbound_data)
+
+    # Train-test split
+    inbound_train, inbound_val, outbound_train, outbound_val = train_test_split(
+        inbound_data, outbound_data, test_size=0.2, random_state=42
+    )
+    print(f"Number of training data pairs: {len(inbound_train)}")
+
+    if args.islands > 1:
+        # Step 4/6: Evolve the sub-populations in their own processes (each holds its own copy of the data)
+        hof, logbook, _ = run_islands(
+            inbound_train, outbound_train, islands=args.islands, population_size=args.population,
+            ngen=args.generations, cxpb=0.7, mutpb=0.2, migration_interval=args.migration_interval,
+            migrants=args.migrants, mode=EVALUATION_MODE, seed=args.seed, penalty=args.parsimony,
+            toolbox_options=toolbox_options, cache_size=args.cache_size,
+        )
+        fitness_cache = FitnessCache(maxsize=args.cache_size)
+    else:
+        # Step 4: Ship the training data to the evaluation processes once, up front
+        if args.workers > 1:
+            pool = create_pool(args.workers, inbound_train, outbound_train, EVALUATION_MODE, args.parsimony)
+            map_func = pool.map
+        else:
+            pool = None
+            map_func = map
+            init_worker(inbound_train, outbound_train, EVALUATION_MODE, args.parsimony)
+
+        # Repeated trees are answered from the cache instead of being sent for evaluation
+        fitness_cache = FitnessCache(maxsize=args.cache_size)
+        toolbox.register("map", fitness_cache.map, map_func=map_func)
+
+        # Step 6: Configure and run the genetic programming evolution process
+        population = [] if resuming else toolbox.population(n=args.population)
+        hof = tools.HallOfFame(1)
+        stats = build_stats()
+
+        try:
+            _, logbook = evolve(
+                population, toolbox, cxpb=0.7, mutpb=0.2, ngen=args.generations, stats=stats, halloffame=hof,
+                patience=args.patience, time_budget=args.time_budget, target=args.target_rmse,
+                checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every, resume=args.resume,
+                metadata={"seed": args.seed, "started_at": started_at}, verbose=True
+            )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    # Step 7: Extract generation and minimum fitness values for plotting
+    gen = logbook.select("gen")
+    min_fitness_values = logbook.chapters["fitness"].select("min")
+    mean_tree_sizes = logbook.chapters["size"].select("avg")
+    print(f"Mean tree size: {mean_tree_sizes[0]:.1f} (generation 0) -> {mean_tree_sizes[-1]:.1f} (final)")
+
+    # Plot fitness progression
+    plt.figure(figsize=(10, 6))
+    plt.plot(gen, min_fitness_values, label="Best Fitness (Min)", marker='o')
+    plt.xlabel("Generation")
+    plt.ylabel("Fitness (RMSE)")
+    plt.title("Fitness Progression Over Generations")
+    plt.legend()
+    plt.grid()
+    plt.show()
+
+    # Step 8: Display the best evolved model
+    best_individual = hof[0]
+    print("Best individual:", best_individual)
+    print("Best training fitness (RMSE):", best_individual.fitness.values[0])
+
+    # Validate the model (in float64, like training)
+    inbound_val = inbound_val.astype(np.float64)
+    outbound_val = outbound_val.astype(np.float64)
+    if EVALUATION_MODE == "vectorized":
+        func = compile_vectorized(best_individual)
+        with np.errstate(all="ignore"):
+            predictions = np.broadcast_to(func(inbound_val), inbound_val.shape)
+    else:
+        func = toolbox.compile(expr=best_individual)
+        predictions = [func(inv) for inv in inbound_val]
+    validate = partial(validation_rmse, inbound=inbound_val, outbound=outbound_val)
+    val_rmse = fitness_cache.map(validate, [best_individual], dataset="validation")[0][0]
+    print("Validation RMSE:", val_rmse)
+    print("Fitness cache:", fitness_cache.stats())
+
+    # Calculate percentage error
+    percentage_error = calculate_percentage_error(predictions, outbound_val)
+    print("Validation Percentage Error:", percentage_error, "%")
+
+    # Store the run, its per-generation statistics and the validation metrics in one write
+    with ResultsStore(args.results) as store:
+        run_id = store.record_run(
+            logbook, params=vars(args), dataset=args.data, seed=args.seed, best_individual=best_individual,
+            train_fitness=best_individual.fitness.values[0], val_rmse=val_rmse,
+            val_percentage_error=percentage_error, started_at=started_at,
+        )
+    print(f"Results for run {run_id} written to {args.results}")
+
+
+    plt.figure(figsize=(10, 6))
+    plt.axhline(y=1, color='red', linestyle='--', label="1% Target")
+    plt.plot(range(len(predictions)), [abs(pred - actual) for pred, actual in zip(predictions, outbound_val)], label="Error", marker='o', linestyle='-', color='blue')
+    plt.xlabel("Data Points")
+    plt.ylabel("Error")
+    plt.title("Prediction Errors on Validation Data")
+    plt.legend()
+    plt.grid()
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
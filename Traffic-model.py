@@ -1,20 +1,20 @@
 import os
 import pandas as pd
 import numpy as np
-import requests
 import folium
 import streamlit as st
 from streamlit_folium import st_folium
-from geopy.geocoders import Nominatim
 from dotenv import load_dotenv
-from deap import base, creator, tools, algorithms
 from regional_insight import regional_dashboard
+from routing import request_routes
+from geocoding import get_geocoder
+from geometry import simplify_for_zoom
+from route_scoring import optimize_route_scoring, preference_multiplier
 import time
 
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv("TOMTOM_API_KEY")
-ROUTING_URL = "https://api.tomtom.com/routing/1/calculateRoute/{start}:{end}/json"
 
 # Initialize session state
 if "routes" not in st.session_state:
@@ -24,11 +24,10 @@ if "selected_route" not in st.session_state:
 
 # Geocoding Function
 def geocode_address(address):
-    geolocator = Nominatim(user_agent="traffic_visualizer")
     try:
-        location = geolocator.geocode(address)
-        if location:
-            return location.latitude, location.longitude
+        coords = get_geocoder().geocode(address)  # Cached; only new addresses reach Nominatim
+        if coords:
+            return coords
         else:
             st.error(f"Could not find location for '{address}'. Try a more specific address.")
             return None
@@ -36,99 +35,16 @@ def geocode_address(address):
         st.error(f"Error with geocoding service: {e}")
         return None
 
-# Fetch Routes
+# Fetch Routes (all route types are requested concurrently)
 def fetch_routes(start_coords, end_coords):
-    route_types = ["fastest", "shortest", "eco"]
-    routes = []
-    for route_type in route_types:
-        url = ROUTING_URL.format(start=",".join(map(str, start_coords)), end=",".join(map(str, end_coords)))
-        params = {"key": API_KEY, "travelMode": "car", "routeType": route_type}
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            route_data = response.json()
-            route_summary = route_data.get("routes", [{}])[0].get("summary", {})
-            route_points = route_data.get("routes", [{}])[0].get("legs", [{}])[0].get("points", [])
-            routes.append({
-                "type": route_type,
-                "distance": route_summary.get("lengthInMeters", 0) / 1609.344,  # Convert meters to miles
-                "travel_time": route_summary.get("travelTimeInSeconds", 0) // 60,  # Convert seconds to minutes
-                "traffic_delay": route_summary.get("trafficDelayInSeconds", 0) // 60,  # Convert seconds to minutes
-                "points": [(point['latitude'], point['longitude']) for point in route_points]
-            })
-        else:
-            st.error(f"API Error for {route_type} route: {response.status_code} - {response.text}")
+    routes, errors = request_routes(start_coords, end_coords, API_KEY)
+    for error in errors:
+        st.error(error)
     return routes
 
 
 def apply_user_preferences(predictions, traffic_vs_time, safety_vs_speed, environmental_impact, route_complexity):
-    predictions = np.array(predictions)
-    
-    # First apply the main trade-offs
-    if traffic_vs_time == "Minimize Time":
-        predictions *= 1.1  # Slightly prioritize time minimization
-    elif traffic_vs_time == "Avoid Traffic":
-        predictions *= 0.9
-    
-    if safety_vs_speed == "Faster Routes":
-        predictions *= 0.95
-    elif safety_vs_speed == "Safer Routes":
-        predictions *= 1.05
-    
-    if environmental_impact > 50:
-        predictions *= 0.85  # Prioritize eco-friendly routes
-    
-    # Apply secondary criteria based on route complexity
-    if route_complexity == "Scenic and Less Crowded":
-        predictions *= 1.05  # Slightly prioritize scenic routes if chosen
-    
-    return predictions
-
-# DEAP Setup for Route Scoring
-creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-creator.create("Individual", list, fitness=creator.FitnessMax)
-
-toolbox = base.Toolbox()
-toolbox.register("attr_float", np.random.uniform, 0, 1)
-toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_float, n=4)
-toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-
-def evaluate(individual):
-    time_weight, safety_weight, env_weight, complexity_weight = individual
-    scores = []
-    
-    for route in st.session_state["routes"]:
-        score = (
-            (1 / (route["travel_time"] + 1)) * time_weight +
-            (1 / (route["traffic_delay"] + 1)) * safety_weight +
-            (1 / (route["distance"] + 1)) * env_weight +
-            complexity_weight
-        )
-        
-        # Add tie-breaking criteria: prefer routes with environmental impact or scenic routes
-        if route["type"] == "eco" and environmental_impact > 50:
-            score *= 1.05  # Slight boost for eco-friendly routes
-        elif route["type"] == "shortest" and route_complexity == "Scenic and Less Crowded":
-            score *= 1.02  # Slight boost for scenic routes in case of ties
-        
-        scores.append(score)
-    
-    return sum(scores),
-
-toolbox.register("evaluate", evaluate)
-toolbox.register("mate", tools.cxBlend, alpha=0.5)
-toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=0.1, indpb=0.2)
-toolbox.register("select", tools.selTournament, tournsize=3)
-
-def optimize_route_scoring(routes):
-    population = toolbox.population(n=50)
-    NGEN, CXPB, MUTPB = 40, 0.5, 0.2
-    for _ in range(NGEN):
-        offspring = algorithms.varAnd(population, toolbox, cxpb=CXPB, mutpb=MUTPB)
-        fits = toolbox.map(toolbox.evaluate, offspring)
-        for fit, ind in zip(fits, offspring):
-            ind.fitness.values = fit
-        population = toolbox.select(offspring, k=len(population))
-    return tools.selBest(population, k=1)[0]
+    return np.array(predictions) * preference_multiplier(traffic_vs_time, safety_vs_speed, environmental_impact, route_complexity)
 
 # Streamlit UI
 st.title("Unified Traffic Management Solution")
@@ -147,7 +63,7 @@ if st.sidebar.button("Fetch Routes"):
     if start_coords and end_coords:
         routes = fetch_routes(start_coords, end_coords)
         st.session_state["routes"] = routes
-        best_weights = optimize_route_scoring(routes)
+        best_weights = optimize_route_scoring(routes, environmental_impact, route_complexity)
     
         for route in routes:
             predictions = np.array([ 
@@ -258,7 +174,9 @@ if st.session_state["routes"]:
 if st.session_state["selected_route"]:
     selected_route = st.session_state["selected_route"]
     st.markdown("### Selected Route")
-    m = folium.Map(location=selected_route["points"][0], zoom_start=12)
+    zoom = 12
+    route_line = simplify_for_zoom(selected_route["points"], zoom)  # Drop detail too small to see at this zoom
+    m = folium.Map(location=route_line[0], zoom_start=zoom)
     
     # Add the route with color-coding based on type
     if selected_route["type"] == "fastest":
@@ -268,13 +186,13 @@ if st.session_state["selected_route"]:
     else:
         color = "orange"
     
-    folium.PolyLine(selected_route["points"], color=color, weight=6, tooltip=f"Route {selected_route['type'].capitalize()}").add_to(m)
+    folium.PolyLine(route_line, color=color, weight=6, tooltip=f"Route {selected_route['type'].capitalize()}").add_to(m)
     
     # Add the start point (first point) as a blue marker (car icon)
-    folium.Marker(location=selected_route["points"][0], popup="Start", icon=folium.Icon(color="blue", icon="car", prefix="fa")).add_to(m)
+    folium.Marker(location=route_line[0], popup="Start", icon=folium.Icon(color="blue", icon="car", prefix="fa")).add_to(m)
     
     # Add the end point (last point) as a red marker
-    folium.Marker(location=selected_route["points"][-1], popup="End", icon=folium.Icon(color="red")).add_to(m)
+    folium.Marker(location=route_line[-1], popup="End", icon=folium.Icon(color="red")).add_to(m)
     
     st_folium(m, width=700, height=500)
 
@@ -293,7 +211,7 @@ if st.session_state["selected_route"]:
     google_maps_url = f"https://www.google.com/maps/dir/{start_location}/{end_location}"
     
     # Waze URL Format
-    waze_url = f"https://www.waze.com/ul?ll={selected_route['points'][0][0]},{selected_route['points'][0][1]}&navigate=yes"
+    waze_url = f"https://www.waze.com/ul?ll={route_line[0][0]},{route_line[0][1]}&navigate=yes"
     
     # Display buttons to open Google Maps and Waze
     col1, col2 = st.columns(2)
@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+try:  # HTTP/2 is used when httpx is installed with its http2 extra (pip install "httpx[http2]")
+    import httpx
+    import h2  # noqa: F401
+except ImportError:
+    httpx = None
+
+# Seconds allowed per attempt for each TomTom endpoint
+ENDPOINT_TIMEOUTS = {
+    "routing": 10,
+    "flow": 5,
+    "incidents": 10,
+}
+DEFAULT_TIMEOUT = 10
+
+# Responses worth retrying: rate limited or a temporary server-side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class ApiRequestError(RuntimeError):
+    """
+    Raised when a request could not be completed (connection error or timeout) after all retries.
+    """
+
+class ApiClient:
+    """
+    One keep-alive connection pool shared by every TomTom call, so repeated requests
+    reuse open TCP/TLS connections instead of doing a new handshake each time.
+    Requests that fail with a connection error, a timeout or a status in RETRY_STATUSES
+    are retried with exponential backoff (honouring Retry-After); the last response is
+    returned as-is, so callers keep their own status_code checks.
+    """
+    def __init__(self, pool_size=32, retries=3, backoff=0.5, max_backoff=8.0, http2=True):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiters = {}  # endpoint -> RateLimiter, see limit_rate
+        self.http2 = http2 and httpx is not None
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            self._session = httpx.Client(http2=True, limits=limits)
+            self._errors = (httpx.HTTPError,)
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._errors = (requests.RequestException,)
+
+    def close(self):
+        self._session.close()
+
+    def limit_rate(self, endpoint, requests_per_second):
+        """
+        Cap the request rate (including retries) to an endpoint for every thread using this client.
+        """
+        self.rate_limiters[endpoint] = RateLimiter(1.0 / requests_per_second)
+
+    def get(self, url, params=None, endpoint=None, timeout=None):
+        if timeout is None:
+            timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+        rate_limiter = self.rate_limiters.get(endpoint)
+        for attempt in range(self.retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.wait()
+            try:
+                response = self._session.get(url, params=params, timeout=timeout)
+            except self._errors as e:
+                if attempt == self.retries:
+                    raise ApiRequestError(str(e)) from e
+                delay = self._backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+            time.sleep(delay)
+
+    def _backoff_delay(self, attempt):
+        # Full jitter so clients that failed together do not retry together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _retry_after(self, response):
+        try:
+            return min(self.max_backoff, float(response.headers.get("Retry-After")))
+        except (TypeError, ValueError):
+            return None
+
+class RateLimiter:
+    """
+    Spaces calls at least min_interval seconds apart across all threads sharing the limiter.
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    The process-wide ApiClient, created on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient()
+        return _client
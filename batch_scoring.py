@@ -0,0 +1,124 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from api_client import get_client
+from geocoding import get_geocoder
+from routing import fetch_route_type, route_cache, ROUTE_TYPES, REQUEST_TIMEOUT
+from route_scoring import score_route_table
+from historical_profiles import historical_profiles, TIMES_OF_DAY
+
+COORD_COLUMNS = ["start_lat", "start_lon", "end_lat", "end_lon"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch and score routes for many origin/destination pairs.")
+    parser.add_argument("--input", required=True,
+                        help="CSV or Parquet file with start_lat, start_lon, end_lat, end_lon columns "
+                             "or origin and destination address columns")
+    parser.add_argument("--output", default="route_scores.parquet", help="Parquet file for the scored routes")
+    parser.add_argument("--route-types", nargs="+", default=ROUTE_TYPES, help="TomTom route types to fetch per pair")
+    parser.add_argument("--max-alternatives", type=int, default=0, help="Alternative routes requested per route type")
+    parser.add_argument("--workers", type=int, default=8, help="Route requests in flight at once")
+    parser.add_argument("--rate", type=float, default=5.0, help="Maximum routing requests per second")
+    parser.add_argument("--traffic-vs-time", choices=["Minimize Time", "Avoid Traffic"], default="Minimize Time")
+    parser.add_argument("--safety-vs-speed", choices=["Faster Routes", "Safer Routes"], default="Faster Routes")
+    parser.add_argument("--environmental-impact", type=int, default=50, help="Environmental impact (%%), 0-100")
+    parser.add_argument("--route-complexity", choices=["Scenic and Less Crowded", "Fastest"],
+                        default="Scenic and Less Crowded")
+    parser.add_argument("--time-of-day", choices=TIMES_OF_DAY, default=None,
+                        help="Time of day for the historical adjustment (drawn per route when omitted)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the historical data draws")
+    return parser.parse_args()
+
+def load_pairs(path):
+    """
+    O/D pairs with a pair_id and coordinates; addresses are geocoded through the shared cache.
+    """
+    pairs = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    pairs = pairs.reset_index(drop=True)
+    pairs.insert(0, "pair_id", np.arange(len(pairs)))
+    if set(COORD_COLUMNS).issubset(pairs.columns):
+        return pairs
+
+    geocoder = get_geocoder()
+    coords = {}
+    for address in pd.unique(pairs[["origin", "destination"]].to_numpy().ravel()):
+        try:
+            coords[address] = geocoder.geocode(address)
+        except Exception as e:
+            print(f"Error geocoding '{address}': {e}")
+            coords[address] = None
+    for column, prefix in [("origin", "start"), ("destination", "end")]:
+        found = [coords[address] or (np.nan, np.nan) for address in pairs[column]]
+        pairs[f"{prefix}_lat"] = [lat for lat, _ in found]
+        pairs[f"{prefix}_lon"] = [lon for _, lon in found]
+    return pairs
+
+def fetch_pair_routes(pairs, api_key, route_types, max_alternatives=0, workers=8):
+    """
+    One row per fetched route (without its points), or per failed request with the error message.
+    Pairs whose rounded coordinates match share one set of requests.
+    """
+    rows = []
+    located = pairs.dropna(subset=COORD_COLUMNS)
+    for pair_id in pairs.loc[~pairs.index.isin(located.index), "pair_id"]:
+        rows.append({"pair_id": pair_id, "error": "Could not geocode origin or destination"})
+
+    corridors = located[COORD_COLUMNS].round(route_cache.precision)
+    corridor_pairs = located.groupby([corridors[c] for c in COORD_COLUMNS], sort=False)["pair_id"].apply(list)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (pair_ids, route_type,
+             executor.submit(fetch_route_type, (start_lat, start_lon), (end_lat, end_lon),
+                             route_type, api_key, max_alternatives, REQUEST_TIMEOUT, route_cache))
+            for (start_lat, start_lon, end_lat, end_lon), pair_ids in corridor_pairs.items()
+            for route_type in route_types
+        ]
+        for pair_ids, route_type, future in futures:
+            try:
+                routes = future.result()
+            except Exception as e:
+                rows.extend({"pair_id": pair_id, "type": route_type, "error": str(e)} for pair_id in pair_ids)
+                continue
+            for route in routes:
+                route.pop("points", None)
+                rows.extend({"pair_id": pair_id, **route, "error": None} for pair_id in pair_ids)
+    return pd.DataFrame(rows, columns=["pair_id", "type", "alternative", "distance", "travel_time",
+                                       "traffic_delay", "error"])
+
+def main():
+    args = parse_args()
+    load_dotenv()
+    api_key = os.getenv("TOMTOM_API_KEY")
+    get_client().limit_rate("routing", args.rate)
+
+    start = time.perf_counter()
+    pairs = load_pairs(args.input)
+    print(f"Loaded {len(pairs)} O/D pairs from {args.input}")
+
+    routes = fetch_pair_routes(pairs, api_key, args.route_types, args.max_alternatives, args.workers)
+    fetched = routes[routes["error"].isna()]
+    failed = routes[routes["error"].notna()]
+
+    fetched = pairs.merge(fetched, on="pair_id", how="right")
+    failed = pairs.merge(failed, on="pair_id", how="right")
+
+    if len(fetched):
+        historical_profiles.seed(args.seed)
+        fetched = historical_profiles.adjust_frame(fetched, time_of_day=args.time_of_day)
+        fetched = score_route_table(fetched, args.traffic_vs_time, args.safety_vs_speed,
+                                    args.environmental_impact, args.route_complexity)
+    scored = pd.concat([fetched, failed], ignore_index=True).sort_values("pair_id", kind="stable")
+    scored.to_parquet(args.output, index=False)
+
+    print(f"Scored {len(fetched)} routes for {fetched['pair_id'].nunique()} pairs "
+          f"({len(failed)} failed requests) in {time.perf_counter() - start:.1f} s")
+    print("Route cache:", route_cache.stats())
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+# Only these columns are read from the classified-count exports
+COUNT_COLUMNS = ["direction", "Car"]
+COUNT_DTYPES = {"direction": "category", "Car": "float32"}
+
+def resolve_count_files(path):
+    """
+    Expand a single CSV file, a directory of daily CSV files or a glob pattern into a sorted file list.
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.csv")))
+    else:
+        files = sorted(glob.glob(path))
+    if not files:
+        raise FileNotFoundError(f"No classified-count files found at '{path}'.")
+    return files
+
+def read_direction_counts(file_path, chunksize=100000):
+    """
+    Stream one export in chunks and return its inbound and outbound car counts as float32 arrays.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    if any(column not in header for column in COUNT_COLUMNS):
+        raise ValueError(f"Dataset '{file_path}' must include 'direction' and 'Car' columns.")
+
+    inbound_chunks, outbound_chunks = [], []
+    for chunk in pd.read_csv(file_path, usecols=COUNT_COLUMNS, dtype=COUNT_DTYPES, chunksize=chunksize):
+        direction = chunk["direction"]
+        cars = chunk["Car"].to_numpy()
+        inbound_chunks.append(cars[(direction == "in").to_numpy()])
+        outbound_chunks.append(cars[(direction == "out").to_numpy()])
+
+    inbound = np.concatenate(inbound_chunks) if inbound_chunks else np.empty(0, dtype=np.float32)
+    outbound = np.concatenate(outbound_chunks) if outbound_chunks else np.empty(0, dtype=np.float32)
+    if len(inbound) != len(outbound):
+        raise ValueError(f"Mismatch in the number of 'in' and 'out' rows in '{file_path}'.")
+    return inbound, outbound
+
+def load_classified_counts(path, chunksize=100000):
+    """
+    Load paired inbound/outbound car counts from one or many exports as contiguous float32 arrays.
+    Rows are paired within each file, in file order, as the single-file loader always did.
+    """
+    inbound_parts, outbound_parts = [], []
+    for file_path in resolve_count_files(path):
+        inbound, outbound = read_direction_counts(file_path, chunksize=chunksize)
+        print(f"Loaded {len(inbound)} data pairs from {file_path}")
+        inbound_parts.append(inbound)
+        outbound_parts.append(outbound)
+    return np.concatenate(inbound_parts), np.concatenate(outbound_parts)
+
+def normalize(values):
+    """
+    Z-score normalisation (sample standard deviation, like pandas) that keeps the float32 dtype.
+    """
+    mean = values.mean(dtype=np.float64)
+    std = values.std(dtype=np.float64, ddof=1)
+    return ((values - mean) / std).astype(np.float32)
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import pandas as pd
+from dotenv import load_dotenv
+from api_client import get_client
+
+# Load environment variables
+load_dotenv()
+
+# TomTom API Configuration
+API_KEY = os.getenv("TOMTOM_API_KEY2")
+URL = "https://api.tomtom.com/traffic/services/4/flowSegmentData/relative0/10/json"
+
+# Static locations for the West Midlands
+locations = {
+    "Birmingham": "52.4862,-1.8904",
+    "Coventry": "52.4081,-1.5100",
+    "Wolverhampton": "52.5862,-2.1275",
+    "Solihull": "52.4128,-1.7782",
+    "Walsall": "52.5860,-1.9829",
+    "Dudley": "52.5087,-2.0873",
+    "Sandwell": "52.5090,-2.0125"
+}
+
+FLOW_COLUMNS = ["Location", "Current Speed", "Free Flow Speed", "Confidence", "Road Closure", "Latitude", "Longitude"]
+
+DEFAULT_TTL = 10  # Seconds between refreshes when no refresh interval has been chosen
+IDLE_TIMEOUT = 300  # The refresher stops after this many seconds without readers
+
+# Bounded so a long location list cannot open an unbounded number of connections
+FLOW_WORKERS = 8
+FLOW_TIMEOUT = 5  # Seconds allowed for each location
+
+_executor = ThreadPoolExecutor(max_workers=FLOW_WORKERS, thread_name_prefix="flow")
+
+def fetch_location(name, coord, api_key=API_KEY, timeout=FLOW_TIMEOUT):
+    """
+    Current flow at one location as a row dict; raises RuntimeError with a message for the dashboard.
+    """
+    params = {
+        "key": api_key,
+        "point": coord,
+        "zoom": 10
+    }
+    try:
+        response = get_client().get(URL, params=params, endpoint="flow", timeout=timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"API Error for {name}: {response.status_code}")
+        data = response.json()
+        lat, lon = map(float, coord.split(","))
+        return {
+            "Location": name,
+            "Current Speed": data["flowSegmentData"]["currentSpeed"],
+            "Free Flow Speed": data["flowSegmentData"]["freeFlowSpeed"],
+            "Confidence": data["flowSegmentData"]["confidence"],
+            "Road Closure": data["flowSegmentData"].get("roadClosure", "No"),
+            "Latitude": lat,
+            "Longitude": lon
+        }
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error fetching data for {name}: {e}") from e
+
+# Fetch traffic data function
+def fetch_west_midlands_data(api_key=API_KEY, timeout=FLOW_TIMEOUT):
+    """
+    Current flow at every location, fetched concurrently; returns (DataFrame, error messages).
+    Rows keep the order of locations; a location that fails or takes longer than timeout
+    seconds is left out and reported, without holding up the others.
+    """
+    futures = {name: _executor.submit(fetch_location, name, coord, api_key, timeout)
+               for name, coord in locations.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results, errors = [], []
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors.append(f"Timed out fetching data for {name} after {timeout} seconds")
+        elif future.exception() is not None:
+            errors.append(str(future.exception()))
+        else:
+            results.append(future.result())
+    return pd.DataFrame(results, columns=FLOW_COLUMNS), errors
+
+class FlowCache:
+    """
+    One flow snapshot per process, shared by every dashboard session. A background thread
+    refetches it while anyone is reading, every `ttl` seconds: the shortest refresh interval
+    any reader asked for within idle_timeout, so the number of API calls depends on the
+    refresh intervals, not on the number of viewers. Readers get a copy.
+    """
+    def __init__(self, fetch=fetch_west_midlands_data, ttl=DEFAULT_TTL, idle_timeout=IDLE_TIMEOUT):
+        self.fetch = fetch
+        self.default_ttl = ttl
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.refreshes = 0
+        self.reads = 0
+        self._data = None
+        self._errors = []
+        self._fetched_at = None
+        self._last_read = 0.0
+        self._requested_ttls = {}  # Refresh interval -> last time a reader asked for it
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # One fetch at a time
+        self._wake = threading.Event()
+        self._thread = None
+
+    def refresh(self, since=None):
+        """
+        Fetch a new snapshot, unless another thread finished one after `since` while this one waited.
+        """
+        with self._refresh_lock:
+            if since is not None and self._fetched_at is not None and self._fetched_at >= since:
+                return
+            data, errors = self.fetch()
+            with self._lock:
+                self._data, self._errors, self._fetched_at = data, errors, time.time()
+                self.refreshes += 1
+
+    def _active_ttl(self, now):
+        """
+        Shortest refresh interval requested within idle_timeout (call with the lock held).
+        """
+        for ttl, requested_at in list(self._requested_ttls.items()):
+            if now - requested_at > self.idle_timeout:
+                del self._requested_ttls[ttl]
+        return min(self._requested_ttls, default=self.default_ttl)
+
+    def snapshot(self, ttl=None, force=False):
+        """
+        (DataFrame copy, errors, fetch time) of the shared snapshot. ttl is the viewer's refresh
+        interval: a snapshot older than that is refetched before returning (as it is with force),
+        and the refresher runs at the shortest interval of all active viewers.
+        """
+        requested_at = time.time()
+        with self._lock:
+            self._last_read = requested_at
+            self.reads += 1
+            if ttl is not None:
+                self._requested_ttls[ttl] = requested_at
+            active_ttl = self._active_ttl(requested_at)
+            if active_ttl != self.ttl:
+                self.ttl = active_ttl
+                self._wake.set()  # Reschedule the next refresh with the new interval
+            max_age = self.ttl if ttl is None else ttl
+            stale = self._fetched_at is None or requested_at - self._fetched_at >= max_age
+        if stale or force:
+            self.refresh(since=requested_at)  # e.g. the first read after the refresher went idle
+        self._ensure_refresher()
+        with self._lock:
+            return self._data.copy(), list(self._errors), self._fetched_at
+
+    def _ensure_refresher(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="flow-refresher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                self.ttl = ttl = self._active_ttl(now)  # Viewers that have left no longer count
+                age = now - self._fetched_at if self._fetched_at else ttl
+                idle = now - self._last_read > self.idle_timeout
+            if idle:
+                return
+            if self._wake.wait(timeout=max(0.0, ttl - age)):
+                self._wake.clear()
+                continue
+            try:
+                self.refresh()
+            except Exception:
+                time.sleep(ttl)  # Keep serving the last snapshot and try again next interval
+
+    def stats(self):
+        return {"reads": self.reads, "refreshes": self.refreshes, "ttl": self.ttl,
+                "age": round(time.time() - self._fetched_at, 1) if self._fetched_at else None}
+
+# Shared by all dashboard sessions in this process
+flow_cache = FlowCache()
@@ -0,0 +1,116 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from geopy.geocoders import Nominatim
+from api_client import RateLimiter
+
+GEOCODE_DB = "geocode_cache.sqlite"
+GEOCODE_TTL = 30 * 24 * 3600  # Place coordinates rarely change; keep results for 30 days
+NOT_FOUND_TTL = 24 * 3600  # Retry addresses Nominatim could not find after a day
+NOMINATIM_INTERVAL = 1.0  # Nominatim usage policy: at most one request per second
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodes (
+    query TEXT PRIMARY KEY,
+    latitude REAL,
+    longitude REAL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+def normalize_address(address):
+    """
+    Cache key for an address: case, spacing and stray punctuation differences are ignored,
+    so "Birmingham, UK" and " birmingham ,uk." share one entry.
+    """
+    address = re.sub(r"\s*,\s*", ", ", address.strip().lower())
+    address = re.sub(r"\s+", " ", address)
+    return address.strip(" ,.;")
+
+class Geocoder:
+    """
+    Nominatim lookups behind an in-process LRU and an on-disk SQLite cache with TTL.
+    Only cache misses reach Nominatim, and those are rate limited to one request per second.
+    Addresses that could not be found are cached too (for NOT_FOUND_TTL), as None.
+    """
+    def __init__(self, path=GEOCODE_DB, maxsize=1024, ttl=GEOCODE_TTL, not_found_ttl=NOT_FOUND_TTL,
+                 user_agent="traffic_visualizer"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # query -> (coords or None, fetched_at)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._geolocator = Nominatim(user_agent=user_agent)
+        self._rate_limiter = RateLimiter(NOMINATIM_INTERVAL)
+
+    def geocode(self, address):
+        """
+        (latitude, longitude) of an address, or None if it could not be found.
+        Errors from the geocoding service are raised to the caller.
+        """
+        query = normalize_address(address)
+        with self._lock:
+            entry = self._memory.get(query)
+            if entry is not None and self._fresh(*entry):
+                self._memory.move_to_end(query)
+                self.memory_hits += 1
+                return entry[0]
+            row = self._conn.execute(
+                "SELECT latitude, longitude, fetched_at FROM geocodes WHERE query = ?", (query,)
+            ).fetchone()
+            if row is not None:
+                coords = None if row[0] is None else (row[0], row[1])
+                if self._fresh(coords, row[2]):
+                    self.disk_hits += 1
+                    self._remember(query, coords, row[2])
+                    return coords
+            self.misses += 1
+
+        self._rate_limiter.wait()
+        location = self._geolocator.geocode(address, exactly_one=True)
+        coords = (location.latitude, location.longitude) if location else None
+        fetched_at = time.time()
+        with self._lock:
+            self._remember(query, coords, fetched_at)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO geocodes (query, latitude, longitude, fetched_at) VALUES (?, ?, ?, ?)",
+                    (query, coords[0] if coords else None, coords[1] if coords else None, fetched_at),
+                )
+        return coords
+
+    def _fresh(self, coords, fetched_at):
+        ttl = self.ttl if coords is not None else self.not_found_ttl
+        return time.time() - fetched_at < ttl
+
+    def _remember(self, query, coords, fetched_at):
+        self._memory[query] = (coords, fetched_at)
+        self._memory.move_to_end(query)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)  # Evict the least recently used address
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {"size": len(self._memory), "memory_hits": self.memory_hits, "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0}
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+def get_geocoder():
+    """
+    The process-wide Geocoder, created on first use.
+    """
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = Geocoder()
+        return _geocoder
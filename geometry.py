@@ -0,0 +1,65 @@
+import numpy as np
+
+POINT_DTYPE = np.float32  # About 0.5 m of precision at UK latitudes, half the memory of float64
+DEFAULT_PIXEL_TOLERANCE = 1.0  # Detail smaller than this many screen pixels is dropped
+
+def points_array(points):
+    """
+    (n, 2) array of (lat, lon) rows from a sequence of coordinate pairs.
+    """
+    return np.asarray(points, dtype=POINT_DTYPE).reshape(-1, 2)
+
+def zoom_tolerance(zoom, pixels=DEFAULT_PIXEL_TOLERANCE, lat=0.0):
+    """
+    Size of `pixels` web-map pixels at a zoom level (256-pixel tiles) and latitude, in the
+    units simplify_polyline measures in: degrees of longitude scaled by cos(latitude).
+    """
+    return pixels * 360.0 / (256 * 2 ** zoom) * np.cos(np.radians(lat))
+
+def _segment_distances(points, start, end):
+    """
+    Distance from each point to the segment start-end, in the same units as the points.
+    """
+    direction = end - start
+    length_sq = direction @ direction
+    if length_sq == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ direction / length_sq, 0, 1)
+    return np.hypot(*(points - (start + t[:, None] * direction)).T)
+
+def simplify_polyline(points, tolerance):
+    """
+    Douglas-Peucker simplification of a (lat, lon) polyline: keeps the points needed to stay
+    within tolerance degrees of the original line. Longitudes are scaled by cos(latitude) so
+    the tolerance is the same in both directions. Returns a subset of the input rows.
+    """
+    points = points_array(points)
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    projected = points.astype(np.float64)
+    projected[:, 1] *= np.cos(np.radians(projected[:, 0].mean()))
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(projected[first + 1:last], projected[first], projected[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+def simplify_for_zoom(points, zoom, pixels=DEFAULT_PIXEL_TOLERANCE):
+    """
+    The polyline with detail too small to see at this zoom level removed, as a list for folium.
+    Coordinates are rounded to 6 decimals (about 0.1 m) to keep the map HTML short.
+    """
+    points = points_array(points)
+    lat = float(points[:, 0].mean()) if len(points) else 0.0
+    return np.round(simplify_polyline(points, zoom_tolerance(zoom, pixels, lat)).astype(np.float64), 6).tolist()
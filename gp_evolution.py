@@ -0,0 +1,148 @@
+import gzip
+import os
+import pickle
+import random
+import time
+import numpy as np
+from deap import tools, algorithms
+
+def save_checkpoint(path, **state):
+    """
+    Write the evolution state to a gzip-compressed pickle. The file is replaced atomically,
+    so a run killed mid-write still leaves the previous checkpoint intact.
+    """
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    with gzip.open(path, "rb") as f:
+        return pickle.load(f)
+
+def create_logbook(stats, *fields):
+    """
+    Empty logbook with headers for the given leading fields and the statistics
+    (one chapter per statistic when stats is a MultiStatistics).
+    """
+    logbook = tools.Logbook()
+    if isinstance(stats, tools.MultiStatistics):
+        logbook.header = list(fields) + stats.fields
+        for name, chapter_stats in stats.items():
+            logbook.chapters[name].header = chapter_stats.fields
+    else:
+        logbook.header = list(fields) + (stats.fields if stats else [])
+    return logbook
+
+def check_stop(gen, ngen, best, stale, elapsed, patience=None, time_budget=None, target=None):
+    """
+    Reason the run should stop after this generation, or None to keep going.
+    """
+    if target is not None and best <= target:
+        return "target_reached"
+    if patience is not None and stale >= patience:
+        return "no_improvement"
+    if time_budget is not None and elapsed >= time_budget:
+        return "time_budget"
+    if gen >= ngen:
+        return "max_generations"
+    return None
+
+def evolve(population, toolbox, cxpb, mutpb, ngen, stats=None, halloffame=None, patience=None,
+           time_budget=None, target=None, min_delta=0.0, checkpoint=None, checkpoint_every=10,
+           resume=False, metadata=None, verbose=__debug__):
+    """
+    Same generational loop as algorithms.eaSimple (for a minimised fitness), plus stopping rules:
+    patience (generations without the best 'min' improving by more than min_delta),
+    time_budget (wall-clock seconds) and target (fitness at or below which the run is done).
+    The reason the run stopped is stored as 'stop_reason' in the last logbook record.
+
+    If checkpoint is a file path, the population, hall of fame, logbook, RNG states and
+    stopping counters are saved there every checkpoint_every generations and when the run
+    stops. With resume=True an existing checkpoint is loaded and the run carries on from it
+    (the population passed in is then replaced); without one the run starts from scratch.
+    metadata (e.g. the run's seed) is saved with every checkpoint; read it back with load_checkpoint.
+    """
+    if resume and checkpoint and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        population[:] = state["population"]
+        if halloffame is not None:
+            halloffame.clear()
+            halloffame.update(state["halloffame"])
+        logbook = state["logbook"]
+        gen, best, stale = state["gen"], state["best"], state["stale"]
+        random.setstate(state["rndstate"])
+        np.random.set_state(state["np_rndstate"])
+        start = time.perf_counter() - state["elapsed"]
+        logbook[-1].pop("stop_reason", None)
+        if verbose:
+            print(f"Resumed from {checkpoint} at generation {gen}")
+    else:
+        logbook = create_logbook(stats, "gen", "nevals")
+        start = time.perf_counter()
+
+        # Evaluate the individuals with an invalid fitness
+        invalid_ind = [ind for ind in population if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+
+        if halloffame is not None:
+            halloffame.update(population)
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=0, nevals=len(invalid_ind), **record)
+        if verbose:
+            print(logbook.stream)
+
+        gen = 0
+        best = min(ind.fitness.values[0] for ind in population)
+        stale = 0
+
+    def write_checkpoint():
+        save_checkpoint(
+            checkpoint, population=population, gen=gen, best=best, stale=stale,
+            halloffame=list(halloffame) if halloffame is not None else [], logbook=logbook,
+            rndstate=random.getstate(), np_rndstate=np.random.get_state(),
+            elapsed=time.perf_counter() - start, metadata=metadata or {},
+        )
+
+    stop_reason = check_stop(gen, ngen, best, stale, time.perf_counter() - start, patience, time_budget, target)
+
+    # Begin the generational process
+    while stop_reason is None:
+        gen += 1
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+
+        if halloffame is not None:
+            halloffame.update(offspring)
+
+        population[:] = offspring
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=len(invalid_ind), **record)
+        if verbose:
+            print(logbook.stream)
+
+        generation_best = min(ind.fitness.values[0] for ind in population)
+        if generation_best < best - min_delta:
+            best = generation_best
+            stale = 0
+        else:
+            stale += 1
+        stop_reason = check_stop(gen, ngen, best, stale, time.perf_counter() - start, patience, time_budget, target)
+        if checkpoint and stop_reason is None and gen % checkpoint_every == 0:
+            write_checkpoint()
+
+    logbook[-1]["stop_reason"] = stop_reason
+    if checkpoint:
+        write_checkpoint()
+    if verbose:
+        print(f"Stopped after generation {gen}: {stop_reason}")
+    return population, logbook
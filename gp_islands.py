@@ -0,0 +1,133 @@
+import multiprocessing
+import queue
+import random
+import numpy as np
+from deap import tools, algorithms
+from traffic_gp import build_toolbox, build_stats, init_worker, FitnessCache, COMPLEXITY_PENALTY
+from gp_evolution import create_logbook
+
+def migrate(population, inbox, outbox, migrants, toolbox):
+    """
+    Send copies of this island's best individuals to the next island and replace
+    the worst individuals here with the ones received from the previous island.
+    """
+    outbox.put([toolbox.clone(ind) for ind in tools.selBest(population, migrants)])
+    immigrants = inbox.get()
+    worst = sorted(range(len(population)), key=lambda i: population[i].fitness)[:len(immigrants)]
+    for i, immigrant in zip(worst, immigrants):
+        population[i] = immigrant
+    return immigrants
+
+def run_island(index, inbox, outbox, results, inbound, outbound, mode, population_size,
+               ngen, cxpb, mutpb, migration_interval, migrants, seed, penalty, toolbox_options, cache_size):
+    """
+    Evolve one sub-population in its own process, exchanging migrants every migration_interval generations.
+    """
+    random.seed(None if seed is None else seed + index)  # Forked islands must not share RNG state
+    init_worker(inbound, outbound, mode, penalty)
+    toolbox = build_toolbox(**toolbox_options)
+    toolbox.register("map", FitnessCache(maxsize=cache_size).map)
+
+    population = toolbox.population(n=population_size)
+    hof = tools.HallOfFame(1)
+    stats = build_stats()
+    logbook = create_logbook(stats, "gen", "island", "nevals")
+
+    invalid_ind = [ind for ind in population if not ind.fitness.valid]
+    for ind, fit in zip(invalid_ind, toolbox.map(toolbox.evaluate, invalid_ind)):
+        ind.fitness.values = fit
+    hof.update(population)
+    logbook.record(gen=0, island=index, nevals=len(invalid_ind), **stats.compile(population))
+
+    for gen in range(1, ngen + 1):
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        for ind, fit in zip(invalid_ind, toolbox.map(toolbox.evaluate, invalid_ind)):
+            ind.fitness.values = fit
+        population[:] = offspring
+
+        if outbox is not None and gen % migration_interval == 0:
+            migrate(population, inbox, outbox, migrants, toolbox)
+        hof.update(population)
+        logbook.record(gen=gen, island=index, nevals=len(invalid_ind), **stats.compile(population))
+
+    results.put((index, list(hof), logbook))
+
+def merge_chapter(records):
+    """
+    Whole-archipelago statistics from per-island avg/std/min/max records of equal-sized islands.
+    """
+    avgs = np.array([r["avg"] for r in records])
+    stds = np.array([r["std"] for r in records])
+    avg = avgs.mean()
+    return {
+        "avg": avg,
+        "std": np.sqrt(np.mean(stds ** 2 + avgs ** 2) - avg ** 2),
+        "min": min(r["min"] for r in records),
+        "max": max(r["max"] for r in records),
+    }
+
+def merge_logbooks(island_logbooks, stats):
+    """
+    Combine per-island logbooks into one logbook with the statistics of the whole archipelago per generation.
+    """
+    logbook = create_logbook(stats, "gen", "nevals")
+    for gen, records in enumerate(zip(*island_logbooks)):
+        chapters = {
+            name: merge_chapter([island_logbook.chapters[name][gen] for island_logbook in island_logbooks])
+            for name in stats.fields
+        }
+        logbook.record(gen=records[0]["gen"], nevals=sum(r["nevals"] for r in records), **chapters)
+    return logbook
+
+def run_islands(inbound, outbound, islands=4, population_size=500, ngen=150, cxpb=0.7, mutpb=0.2,
+                migration_interval=10, migrants=5, mode="vectorized", seed=None, penalty=COMPLEXITY_PENALTY,
+                toolbox_options=None, cache_size=50000, verbose=True):
+    """
+    Island-model GP: each island evolves in a separate process and passes its best
+    individuals around a ring. Returns the hall of fame over all islands, the merged
+    logbook and the per-island logbooks. toolbox_options are passed to build_toolbox on every island,
+    and each island keeps a fitness cache of cache_size trees. Islands always run all ngen
+    generations, which is recorded as the stop_reason of the merged logbook.
+    """
+    toolbox_options = toolbox_options or {}
+    queues = [multiprocessing.Queue() for _ in range(islands)]
+    results = multiprocessing.Queue()
+    processes = []
+    for index in range(islands):
+        inbox = queues[index]
+        outbox = queues[(index + 1) % islands] if islands > 1 else None
+        process = multiprocessing.Process(
+            target=run_island,
+            args=(index, inbox, outbox, results, inbound, outbound, mode, population_size,
+                  ngen, cxpb, mutpb, migration_interval, migrants, seed, penalty, toolbox_options, cache_size),
+        )
+        process.start()
+        processes.append(process)
+
+    # Collect before joining so large results cannot block the islands from exiting
+    collected = []
+    while len(collected) < islands:
+        try:
+            collected.append(results.get(timeout=1))
+        except queue.Empty:
+            failed = [p.exitcode for p in processes if p.exitcode not in (None, 0)]
+            if failed:
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError(f"Island process exited with code {failed[0]}.")
+    collected.sort(key=lambda result: result[0])
+    for process in processes:
+        process.join()
+
+    hof = tools.HallOfFame(1)
+    for _, island_hof, _ in collected:
+        hof.update(island_hof)
+    island_logbooks = [island_logbook for _, _, island_logbook in collected]
+    logbook = merge_logbooks(island_logbooks, build_stats())
+    logbook[-1]["stop_reason"] = "max_generations"
+    if verbose:
+        print(logbook)
+    return hof, logbook, island_logbooks
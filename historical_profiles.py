@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+
+TIMES_OF_DAY = ["morning", "afternoon", "evening", "night"]
+METRICS = ["congestion", "accidents", "air_quality"]
+
+# (low, high) of the historical value drawn per time of day and metric; the last row is
+# used for any other time of day. Congestion and accidents are percentages, air quality an AQI index.
+PROFILE_RANGES = np.array([
+    [[70, 90], [0.2, 0.5], [50, 100]],  # Morning rush hour: congestion, accidents and pollution peak
+    [[40, 60], [0.1, 0.3], [30, 60]],  # Afternoon
+    [[50, 80], [0.3, 0.6], [40, 90]],  # Evening peak
+    [[10, 30], [0, 0.1], [10, 30]],  # Night
+    [[30, 70], [0.1, 0.3], [20, 60]],  # Any other time
+], dtype=float)
+
+CORRIDOR_PRECISION = 1  # Corridors are O/D pairs of 0.1 degree cells (roughly 10 km)
+
+class HistoricalProfiles:
+    """
+    Table-driven congestion, accident and air quality profiles. The ranges for every
+    corridor x time of day are precomputed once, so a whole batch of routes is adjusted
+    with one lookup and one vectorized draw.
+
+    corridor_factors maps ((start_lat, start_lon), (end_lat, end_lon)) cells, rounded to
+    precision decimals, to a (times of day + 1) x 3 array of multipliers on PROFILE_RANGES;
+    all other corridors use the ranges as they are.
+    """
+    def __init__(self, ranges=PROFILE_RANGES, corridor_factors=None, precision=CORRIDOR_PRECISION, seed=None):
+        corridor_factors = corridor_factors or {}
+        self.precision = precision
+        self._corridor_index = {corridor: i + 1 for i, corridor in enumerate(corridor_factors)}
+        factors = np.ones((len(corridor_factors) + 1,) + ranges.shape[:2])
+        for corridor, i in self._corridor_index.items():
+            factors[i] = corridor_factors[corridor]
+        self._lookup = ranges[None] * factors[..., None]  # corridor x time of day x metric x (low, high)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()  # Generators are not safe to share between threads
+
+    def seed(self, seed):
+        with self._lock:
+            self._rng = np.random.default_rng(seed)
+
+    def corridor(self, start_coords, end_coords):
+        """
+        Row of the lookup table for a route from start_coords to end_coords (0 when it has no factors).
+        """
+        key = (tuple(round(float(c), self.precision) for c in start_coords),
+               tuple(round(float(c), self.precision) for c in end_coords))
+        return self._corridor_index.get(key, 0)
+
+    def corridors(self, starts, ends):
+        """
+        Lookup rows for many routes; a start or end of None means the corridor is unknown.
+        """
+        if not self._corridor_index:
+            return np.zeros(len(starts), dtype=int)
+        return np.array([0 if start is None or end is None else self.corridor(start, end)
+                         for start, end in zip(starts, ends)], dtype=int)
+
+    def time_slots(self, n, time_of_day=None):
+        """
+        Time-of-day row for n routes: the given time of day for all of them, or a random one each.
+        """
+        if time_of_day is None:
+            with self._lock:
+                return self._rng.integers(len(TIMES_OF_DAY), size=n)
+        slot = TIMES_OF_DAY.index(time_of_day) if time_of_day in TIMES_OF_DAY else len(TIMES_OF_DAY)
+        return np.full(n, slot)
+
+    def adjust(self, travel_time, corridors, slots):
+        """
+        Historical adjustment of a batch of routes: adjusted_travel_time, eco_score and total_score arrays.
+        """
+        bounds = self._lookup[corridors, slots]  # routes x metric x (low, high)
+        with self._lock:
+            draws = self._rng.uniform(bounds[..., 0], bounds[..., 1])
+        congestion, accidents, air_quality = draws.T
+        travel_time = np.asarray(travel_time, dtype=float)
+
+        # Congestion and accident risk increase travel time; worse air quality lowers the eco score
+        adjusted_travel_time = travel_time * (1 + congestion / 100) + travel_time * (accidents / 100)
+        eco_score = np.maximum(0, 100 - air_quality)
+        return {"adjusted_travel_time": adjusted_travel_time, "eco_score": eco_score,
+                "total_score": adjusted_travel_time - eco_score}
+
+    def adjust_routes(self, routes, time_of_day=None):
+        """
+        Adjust a list of route dicts in place; each route's corridor is taken from its first and last point.
+        """
+        if not routes:
+            return routes
+        ends = [(route["points"][0], route["points"][-1]) if len(route["points"]) else (None, None)
+                for route in routes]
+        corridors = self.corridors([start for start, _ in ends], [end for _, end in ends])
+        slots = self.time_slots(len(routes), time_of_day)
+        adjusted = self.adjust([route["travel_time"] for route in routes], corridors, slots)
+        for i, route in enumerate(routes):
+            for field, values in adjusted.items():
+                route[field] = float(values[i])
+        return routes
+
+    def adjust_frame(self, routes, time_of_day=None):
+        """
+        Adjusted copy of a DataFrame of routes with start_lat, start_lon, end_lat and end_lon columns.
+        """
+        corridors = self.corridors(routes[["start_lat", "start_lon"]].to_numpy(),
+                                   routes[["end_lat", "end_lon"]].to_numpy())
+        slots = self.time_slots(len(routes), time_of_day)
+        adjusted = self.adjust(routes["travel_time"].to_numpy(dtype=float), corridors, slots)
+        return routes.assign(time_of_day=np.array(TIMES_OF_DAY + ["other"])[slots], **adjusted)
+
+# Shared by all sessions in this process
+historical_profiles = HistoricalProfiles()
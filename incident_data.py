@@ -0,0 +1,339 @@
+import hashlib
+import json
+import math
+from itertools import chain
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from api_client import get_client
+from geometry import POINT_DTYPE
+from incident_index import IncidentIndex, CELL_METRES
+
+# Define the base URL for TomTom Traffic Incident API
+TRAFFIC_INCIDENT_URL = "https://api.tomtom.com/traffic/services/5/incidentDetails"
+
+# The Incident Viewport API reports the traffic model currently served for an area
+VIEWPORT_URL = ("https://api.tomtom.com/traffic/services/4/incidentViewport/"
+                "{bbox}/{zoom}/{bbox}/{zoom}/false/json")
+VIEWPORT_ZOOM = 11
+
+# Properties requested per incident; id is needed to merge tiles and track changes
+INCIDENT_FIELDS = "{incidents{type,geometry{type,coordinates},properties{id,iconCategory,magnitudeOfDelay,delay}}}"
+
+TILE_DEGREES = 0.5  # Tile edge; about 55 x 34 km in the West Midlands, well under the API's 10,000 km2 limit
+INCIDENT_WORKERS = 8
+INCIDENT_TIMEOUT = 10  # Seconds allowed for each tile
+
+_executor = ThreadPoolExecutor(max_workers=INCIDENT_WORKERS, thread_name_prefix="incidents")
+
+# Define Icon Categories for Mapping
+ICON_CATEGORY_MAP = {
+    1: "Accident",
+    8: "Road Closed",
+    6: "Jam",
+    0: "Unknown",
+    2: "Fog",
+    3: "DangerousConditions",
+    4: "Rain",
+    5: "Ice",
+    7: "LaneClosed",
+    9: "RoadWorks",
+    10: "Wind",
+    11: "Flooding",
+    14: "BrokenDownVehicle"
+}
+
+# Define color mapping for different incidents
+ICON_COLOR_MAP = {
+    "Accident": "red",
+    "Road Closed": "black",
+    "Jam": "orange",
+    "Fog": "gray",
+    "DangerousConditions": "purple",
+    "Rain": "blue",
+    "Ice": "blue",
+    "LaneClosed": "green",
+    "RoadWorks": "yellow",
+    "Wind": "brown",
+    "Flooding": "cyan",
+    "BrokenDownVehicle": "magenta",
+    "Unknown": "gray"
+}
+
+# Fixed categories, so codes mean the same thing in every table
+TYPE_DTYPE = pd.CategoricalDtype(list(ICON_COLOR_MAP))
+COLOR_DTYPE = pd.CategoricalDtype(sorted(set(ICON_COLOR_MAP.values())))
+
+SEVERITY_FIELDS = ("magnitudeOfDelay", "delay", "impact")  # The first one reported is used
+
+def normalize_bbox(start_lat, start_lon, end_lat, end_lon):
+    """
+    (min_lon, min_lat, max_lon, max_lat) of the box spanned by two points, in whichever order they are given.
+    """
+    return min(start_lon, end_lon), min(start_lat, end_lat), max(start_lon, end_lon), max(start_lat, end_lat)
+
+def split_bbox(bbox, tile_degrees=TILE_DEGREES):
+    """
+    Grid of equal tiles covering bbox, none wider or taller than tile_degrees.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    columns = max(1, math.ceil((max_lon - min_lon) / tile_degrees))
+    rows = max(1, math.ceil((max_lat - min_lat) / tile_degrees))
+    width = (max_lon - min_lon) / columns
+    height = (max_lat - min_lat) / rows
+    return [
+        (min_lon + column * width, min_lat + row * height,
+         max_lon if column == columns - 1 else min_lon + (column + 1) * width,
+         max_lat if row == rows - 1 else min_lat + (row + 1) * height)
+        for row in range(rows) for column in range(columns)
+    ]
+
+def fetch_tile(bbox, api_key, timeout=INCIDENT_TIMEOUT, params=None):
+    """
+    Incidents in one tile; raises RuntimeError with a message for the page.
+    """
+    params = dict(params or {})
+    params.update({
+        "key": api_key,
+        "bbox": ",".join(f"{value:.6f}" for value in bbox),
+        "fields": INCIDENT_FIELDS,
+    })
+    try:
+        response = get_client().get(TRAFFIC_INCIDENT_URL, params=params, endpoint="incidents", timeout=timeout)
+    except Exception as e:
+        raise RuntimeError(f"Error fetching traffic incidents: {e}") from e
+    if response.status_code != 200:
+        raise RuntimeError(f"Error fetching traffic incidents: {response.status_code} - {response.text}")
+    return response.json().get("incidents", [])
+
+def incident_key(incident):
+    """
+    The incident's ID, or a hash of its category and geometry when it has none.
+    """
+    properties = incident.get("properties", {})
+    if properties.get("id"):
+        return properties["id"]
+    geometry = json.dumps([properties.get("iconCategory"), incident.get("geometry")], sort_keys=True)
+    return "geometry:" + hashlib.sha1(geometry.encode()).hexdigest()
+
+def merge_incidents(tiles):
+    """
+    Incidents of all tiles in tile order, keeping one copy of those that cross tile edges.
+    """
+    merged = {}
+    for incidents in tiles:
+        for incident in incidents:
+            merged.setdefault(incident_key(incident), incident)
+    return list(merged.values())
+
+def fetch_incidents(bbox, api_key, tile_degrees=TILE_DEGREES, timeout=INCIDENT_TIMEOUT, params=None):
+    """
+    Incidents in bbox, fetched as concurrent tiles and merged; returns (incidents, errors).
+    A tile that fails or takes longer than timeout seconds is reported, and the others are still returned.
+    """
+    futures = [_executor.submit(fetch_tile, tile, api_key, timeout, params) for tile in split_bbox(bbox, tile_degrees)]
+    wait(futures, timeout=timeout)
+
+    tiles, errors = [], []
+    for future in futures:
+        if not future.done():
+            future.cancel()
+            errors.append(f"Timed out fetching traffic incidents after {timeout} seconds")
+        elif future.exception() is not None:
+            errors.append(str(future.exception()))
+        else:
+            tiles.append(future.result())
+    return merge_incidents(tiles), errors
+
+def fetch_traffic_model_id(bbox, api_key, timeout=INCIDENT_TIMEOUT):
+    """
+    ID of the traffic model currently served for bbox; it changes whenever the incidents may have.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    url = VIEWPORT_URL.format(bbox=f"{min_lat:.6f},{min_lon:.6f},{max_lat:.6f},{max_lon:.6f}", zoom=VIEWPORT_ZOOM)
+    params = {"key": api_key, "projection": "EPSG4326"}
+    try:
+        response = get_client().get(url, params=params, endpoint="incidents", timeout=timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"Error fetching traffic model: {response.status_code} - {response.text}")
+        return response.json()["viewpResp"]["trafficState"]["@trafficModelId"]
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error fetching traffic model: {e}") from e
+
+def incident_version(incident):
+    """
+    Hash of everything reported about an incident, used to tell whether it changed.
+    """
+    return hashlib.sha1(json.dumps(incident, sort_keys=True).encode()).hexdigest()
+
+class IncidentTable:
+    """
+    The incidents of one region keyed by incident ID, kept current by polling. A poll first
+    asks for the traffic model ID, which is cheap; the incidents are only refetched when it
+    has changed, and each poll reports which incidents were added, updated or removed so
+    callers only redo the work for those.
+    """
+    def __init__(self, bbox, api_key, tile_degrees=TILE_DEGREES, timeout=INCIDENT_TIMEOUT):
+        self.bbox = bbox
+        self.api_key = api_key
+        self.tile_degrees = tile_degrees
+        self.timeout = timeout
+        self.incidents = {}  # key -> incident as returned by the API
+        self.model_id = None
+        self.polled_at = None
+        self.fetched_at = None  # Last fetch that returned incidents for at least part of the region
+        self.polls = 0
+        self.unchanged = 0
+        self._versions = {}
+
+    def apply(self, incidents, complete=True):
+        """
+        Merge a fetch into the table and return its delta. Incidents missing from an incomplete
+        fetch (some tiles failed) are kept, since they may just be in a tile that failed.
+        """
+        delta = {"added": [], "updated": [], "removed": []}
+        seen = set()
+        for incident in incidents:
+            key, version = incident_key(incident), incident_version(incident)
+            seen.add(key)
+            if key not in self.incidents:
+                delta["added"].append(key)
+            elif self._versions[key] != version:
+                delta["updated"].append(key)
+            else:
+                continue
+            self.incidents[key], self._versions[key] = incident, version
+        if complete:
+            delta["removed"] = [key for key in self.incidents if key not in seen]
+            for key in delta["removed"]:
+                del self.incidents[key], self._versions[key]
+        return delta
+
+    def poll(self):
+        """
+        Bring the table up to date; returns (delta, errors).
+        """
+        self.polls += 1
+        self.polled_at = time.time()
+        errors = []
+        try:
+            model_id = fetch_traffic_model_id(self.bbox, self.api_key, self.timeout)
+        except RuntimeError as e:
+            model_id = None  # Fall back to fetching the latest incidents and comparing them
+            errors.append(str(e))
+        if model_id is not None and model_id == self.model_id:
+            self.unchanged += 1
+            return {"added": [], "updated": [], "removed": []}, errors
+
+        params = {"t": model_id} if model_id is not None else None
+        incidents, fetch_errors = fetch_incidents(self.bbox, self.api_key, self.tile_degrees, self.timeout, params)
+        delta = self.apply(incidents, complete=not fetch_errors)
+        if incidents or not fetch_errors:
+            self.fetched_at = self.polled_at
+        if not fetch_errors:
+            self.model_id = model_id  # Otherwise the next poll fetches again to fill the gaps
+        return delta, errors + fetch_errors
+
+    def stats(self):
+        return {"incidents": len(self.incidents), "model_id": self.model_id,
+                "polls": self.polls, "unchanged": self.unchanged}
+
+class IncidentColumns:
+    """
+    Incidents stored column-wise: `frame` has one row per incident (key, iconCategory,
+    categorical type and color, numeric severity with NaN when not reported), and the points
+    of all geometries are one (lon, lat) array, incident i's being
+    coordinates[offsets[i]:offsets[i + 1]]. Incidents without coordinates are left out.
+    """
+    def __init__(self, frame, coordinates, offsets):
+        self.frame = frame
+        self.coordinates = coordinates
+        self.offsets = offsets
+
+    @classmethod
+    def from_incidents(cls, incidents):
+        """
+        Columns of incidents as returned by the API, collected in one pass.
+        """
+        keys, categories, severities, counts, points = [], [], [], [], []
+        for incident in incidents:
+            coordinates = incident.get("geometry", {}).get("coordinates", [])
+            if not coordinates:
+                continue
+            if not isinstance(coordinates[0], (list, tuple)):
+                coordinates = [coordinates]  # A Point has one coordinate pair
+            properties = incident.get("properties", {})
+            keys.append(incident_key(incident))
+            categories.append(properties.get("iconCategory", 0))
+            severities.append(next((properties[field] for field in SEVERITY_FIELDS if properties.get(field)), None))
+            counts.append(len(coordinates))
+            points.extend(coordinates)
+
+        types = pd.Series(categories, dtype=object).map(ICON_CATEGORY_MAP).fillna("Unknown")
+        frame = pd.DataFrame({
+            "key": pd.Series(keys, dtype=object),
+            "iconCategory": pd.to_numeric(pd.Series(categories, dtype=object), errors="coerce"),
+            "type": types.astype(TYPE_DTYPE),
+            "color": types.map(ICON_COLOR_MAP).astype(COLOR_DTYPE),
+            "severity": pd.to_numeric(pd.Series(severities, dtype=object), errors="coerce").astype(float),
+        })
+        coordinates = np.fromiter(chain.from_iterable(points), dtype=POINT_DTYPE, count=2 * len(points)).reshape(-1, 2)
+        offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        return cls(frame, coordinates, offsets)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def points(self, i):
+        """
+        (lon, lat) rows of incident i's geometry.
+        """
+        return self.coordinates[self.offsets[i]:self.offsets[i + 1]]
+
+    def select(self, mask):
+        """
+        The incidents where mask (a boolean array or Series over the rows) is true.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        counts = np.diff(self.offsets)
+        return IncidentColumns(self.frame[mask].reset_index(drop=True),
+                               self.coordinates[np.repeat(mask, counts)],
+                               np.concatenate([[0], np.cumsum(counts[mask])]))
+
+    def spatial_index(self, cell_size=CELL_METRES):
+        """
+        IncidentIndex over these incidents; query results are row positions.
+        """
+        return IncidentIndex(self.coordinates[:, 0], self.coordinates[:, 1], self.offsets, cell_size)
+
+def incidents_geojson(columns):
+    """
+    FeatureCollection of the incidents with a line geometry, with type, color and severity
+    as properties, for drawing all of them as one map layer. Coordinates are rounded to
+    6 decimals (about 0.1 m) to keep the page short.
+    """
+    coordinates = np.round(columns.coordinates.astype(np.float64), 6).tolist()
+    offsets = columns.offsets.tolist()
+    frame = columns.frame
+    features = []
+    for i, (incident_type, color, severity) in enumerate(zip(frame["type"], frame["color"], frame["severity"])):
+        if offsets[i + 1] - offsets[i] < 2:
+            continue  # Single points are only shown as markers
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coordinates[offsets[i]:offsets[i + 1]]},
+            "properties": {"type": incident_type, "color": color,
+                           "severity": None if np.isnan(severity) else float(severity)},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+def start_points(columns):
+    """
+    [lat, lon, type, color] of the first point of every incident.
+    """
+    starts = np.round(columns.coordinates[columns.offsets[:-1]].astype(np.float64), 6)
+    return [[lat, lon, incident_type, color] for (lon, lat), incident_type, color
+            in zip(starts.tolist(), columns.frame["type"], columns.frame["color"])]
@@ -0,0 +1,148 @@
+import numpy as np
+
+CELL_METRES = 500  # Grid cell edge; a few cells cover a typical route buffer
+ROUTE_BUFFER_METRES = 50  # Incidents this close to a route are treated as on it
+METRES_PER_DEGREE = 111320
+
+def _point_segment_distances(points, starts, ends):
+    """
+    Distance from each point to the matching segment, row by row.
+    """
+    direction = ends - starts
+    length_sq = np.einsum("ij,ij->i", direction, direction)
+    t = np.einsum("ij,ij->i", points - starts, direction) / np.where(length_sq > 0, length_sq, 1)
+    closest = starts + np.clip(t, 0, 1)[:, None] * direction
+    return np.hypot(*(points - closest).T)
+
+def _segment_pair_distances(a0, a1, b0, b1):
+    """
+    Distance between segments a0-a1 and b0-b1, row by row; 0 where they cross.
+    """
+    distances = np.minimum.reduce([_point_segment_distances(a0, b0, b1), _point_segment_distances(a1, b0, b1),
+                                   _point_segment_distances(b0, a0, a1), _point_segment_distances(b1, a0, a1)])
+
+    def side(p, q, r):
+        return np.sign((q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0]))
+
+    crossing = (side(a0, a1, b0) * side(a0, a1, b1) < 0) & (side(b0, b1, a0) * side(b0, b1, a1) < 0)
+    return np.where(crossing, 0.0, distances)
+
+class IncidentIndex:
+    """
+    Grid hash over incident geometries for bounding box, radius and route buffer queries.
+    Coordinates are projected to metres around the mean latitude and every segment is filed
+    under each cell its bounding box overlaps, so a query only measures the segments in the
+    cells it touches. Queries return row positions in the IncidentColumns the index was built
+    from (see IncidentColumns.spatial_index).
+    """
+    def __init__(self, lons, lats, offsets, cell_size=CELL_METRES):
+        lons, lats = np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        self.size = len(offsets) - 1
+        self.cell_size = cell_size
+        self._scale = np.cos(np.radians(lats.mean())) if len(lats) else 1.0
+        points = self._project(lons, lats)
+
+        # Consecutive points of one incident form its segments; a single point is a zero-length segment
+        owner = np.repeat(np.arange(self.size), np.diff(offsets))
+        same = owner[:-1] == owner[1:]
+        single = np.flatnonzero(np.diff(offsets) == 1)
+        starts = np.concatenate([np.flatnonzero(same), offsets[single]])
+        ends = np.concatenate([np.flatnonzero(same) + 1, offsets[single]])
+        self._starts, self._ends, self._owner = points[starts], points[ends], owner[starts]
+
+        self._lows, self._highs = np.minimum(self._starts, self._ends), np.maximum(self._starts, self._ends)
+        keys, segments = self._cells(self._lows, self._highs)
+        order = np.argsort(keys, kind="stable")
+        self._keys, self._segments = keys[order], segments[order]
+
+    def _project(self, lons, lats):
+        return np.column_stack([np.asarray(lons, dtype=float) * self._scale,
+                                np.asarray(lats, dtype=float)]) * METRES_PER_DEGREE
+
+    def _cells(self, lows, highs):
+        """
+        (cell key, row) for every cell overlapped by each of the boxes lows-highs, in metres.
+        """
+        low = np.floor(lows / self.cell_size).astype(np.int64)
+        high = np.floor(highs / self.cell_size).astype(np.int64)
+        width, height = (high - low + 1).T
+        counts = width * height
+        rows = np.repeat(np.arange(len(lows)), counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = low[rows, 0] + step % width[rows]
+        y = low[rows, 1] + step // width[rows]
+        return (x << 32) + (y + 2 ** 31), rows
+
+    def _candidate_pairs(self, lows, highs):
+        """
+        (query box, indexed segment) pairs that share a cell, without repeats.
+        """
+        keys, boxes = self._cells(lows, highs)
+        first = np.searchsorted(self._keys, keys, side="left")
+        counts = np.searchsorted(self._keys, keys, side="right") - first
+        boxes = np.repeat(boxes, counts)
+        segments = self._segments[np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        pairs = np.unique(boxes * len(self._owner) + segments)
+        return pairs // max(len(self._owner), 1), pairs % max(len(self._owner), 1)
+
+    def query_segments(self, starts, ends, metres):
+        """
+        Sorted positions of incidents within metres of any of the segments starts-ends (projected).
+        """
+        if not len(self._owner) or not len(starts):
+            return np.empty(0, dtype=np.int64)
+        lows, highs = np.minimum(starts, ends) - metres, np.maximum(starts, ends) + metres
+        queries, segments = self._candidate_pairs(lows, highs)
+        # Sharing a cell is not enough; measure only the pairs whose boxes overlap
+        overlap = np.all((self._lows[segments] <= highs[queries]) & (self._highs[segments] >= lows[queries]), axis=1)
+        queries, segments = queries[overlap], segments[overlap]
+        distances = _segment_pair_distances(starts[queries], ends[queries], self._starts[segments], self._ends[segments])
+        return np.unique(self._owner[segments[distances <= metres]])
+
+    def query_radius(self, lat, lon, metres):
+        """
+        Incidents within metres of a point.
+        """
+        point = self._project([lon], [lat])
+        return self.query_segments(point, point, metres)
+
+    def query_polyline(self, points, metres=ROUTE_BUFFER_METRES):
+        """
+        Incidents within metres of a (lat, lon) polyline such as a route's points.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        projected = self._project(points[:, 1], points[:, 0])
+        if len(projected) == 1:
+            return self.query_segments(projected, projected, metres)
+        return self.query_segments(projected[:-1], projected[1:], metres)
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Incidents with any part inside a bounding box.
+        """
+        low, high = self._project([min_lon, max_lon], [min_lat, max_lat])
+        if not len(self._owner):
+            return np.empty(0, dtype=np.int64)
+        _, segments = self._candidate_pairs(low[None], high[None])
+        starts, ends = self._starts[segments], self._ends[segments]
+        inside = np.all((starts >= low) & (starts <= high), axis=1)
+        corners = np.array([low, [high[0], low[1]], high, [low[0], high[1]]])
+        for edge_start, edge_end in zip(corners, np.roll(corners, -1, axis=0)):  # The four sides of the box
+            inside |= _segment_pair_distances(starts, ends, np.broadcast_to(edge_start, starts.shape),
+                                              np.broadcast_to(edge_end, ends.shape)) == 0
+        return np.unique(self._owner[segments[inside]])
+
+def annotate_routes(routes, incidents, index=None, metres=ROUTE_BUFFER_METRES):
+    """
+    Add the rows of `incidents` (an IncidentColumns) within metres of each route (route dicts
+    with 'points') as route["incidents"], a DataFrame, and their number as route["incident_count"].
+    Pass index to reuse an IncidentIndex built from the same incidents; returns routes.
+    """
+    if index is None:
+        index = incidents.spatial_index()
+    for route in routes:
+        nearby = index.query_polyline(route["points"], metres) if len(route["points"]) else []
+        route["incidents"] = incidents.frame.iloc[nearby].reset_index(drop=True)
+        route["incident_count"] = len(nearby)
+    return routes
@@ -3,56 +3,7 @@ import pandas as pd
 import folium
 from streamlit_folium import st_folium
 import plotly.express as px
-import requests
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# TomTom API Configuration
-API_KEY = os.getenv("TOMTOM_API_KEY2")
-URL = "https://api.tomtom.com/traffic/services/4/flowSegmentData/relative0/10/json"
-
-# Static locations for the West Midlands
-locations = {
-    "Birmingham": "52.4862,-1.8904",
-    "Coventry": "52.4081,-1.5100",
-    "Wolverhampton": "52.5862,-2.1275",
-    "Solihull": "52.4128,-1.7782",
-    "Walsall": "52.5860,-1.9829",
-    "Dudley": "52.5087,-2.0873",
-    "Sandwell": "52.5090,-2.0125"
-}
-
-# Fetch traffic data function
-def fetch_west_midlands_data():
-    results = []
-    for name, coord in locations.items():
-        params = {
-            "key": API_KEY,
-            "point": coord,
-            "zoom": 10
-        }
-        try:
-            response = requests.get(URL, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                lat, lon = map(float, coord.split(","))
-                results.append({
-                    "Location": name,
-                    "Current Speed": data["flowSegmentData"]["currentSpeed"],
-                    "Free Flow Speed": data["flowSegmentData"]["freeFlowSpeed"],
-                    "Confidence": data["flowSegmentData"]["confidence"],
-                    "Road Closure": data["flowSegmentData"].get("roadClosure", "No"),
-                    "Latitude": lat,
-                    "Longitude": lon
-                })
-            else:
-                st.error(f"API Error for {name}: {response.status_code}")
-        except Exception as e:
-            st.error(f"Error fetching data for {name}: {e}")
-    return pd.DataFrame(results)
+from flow_data import flow_cache
 
 # Main function for the dashboard
 def regional_dashboard():
@@ -64,12 +15,10 @@ def regional_dashboard():
     refresh_button = st.sidebar.button("Refresh Data")
     refresh_interval = st.sidebar.slider("Refresh Interval (seconds)", 5, 60, 10)
 
-    # Fetch data on refresh or session state
-    if refresh_button or "data" not in st.session_state:
-        data = fetch_west_midlands_data()
-        st.session_state["data"] = data
-    else:
-        data = st.session_state["data"]
+    # Read the shared snapshot, kept fresh in the background every refresh_interval seconds
+    data, errors, fetched_at = flow_cache.snapshot(ttl=refresh_interval, force=refresh_button)
+    for error in errors:
+        st.error(error)
 
     # Display KPIs and visualizations
     if not data.empty:
@@ -124,7 +73,7 @@ def regional_dashboard():
         st.warning("No data available. Click 'Refresh Data' to fetch traffic information.")
 
     st.caption("Data Source: TomTom API")
-    st.caption(f"Last Updated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    st.caption(f"Last Updated: {pd.Timestamp.fromtimestamp(fetched_at).strftime('%Y-%m-%d %H:%M:%S')}")
 
 
 # import pandas as pd
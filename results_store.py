@@ -0,0 +1,154 @@
+import argparse
+import csv
+import json
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT,
+    finished_at TEXT,
+    seed INTEGER,
+    dataset TEXT,
+    params TEXT,
+    generations INTEGER,
+    stop_reason TEXT,
+    best_individual TEXT,
+    train_fitness REAL,
+    val_rmse REAL,
+    val_percentage_error REAL
+);
+CREATE TABLE IF NOT EXISTS generations (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    gen INTEGER NOT NULL,
+    nevals INTEGER,
+    fitness_min REAL,
+    fitness_avg REAL,
+    fitness_std REAL,
+    fitness_max REAL,
+    size_avg REAL,
+    size_max REAL,
+    PRIMARY KEY (run_id, gen)
+) WITHOUT ROWID;
+"""
+
+RUN_COLUMNS = ["run_id", "started_at", "finished_at", "seed", "dataset", "params", "generations",
+               "stop_reason", "best_individual", "train_fitness", "val_rmse", "val_percentage_error"]
+
+def _float(value):
+    return None if value is None else float(value)
+
+class ResultsStore:
+    """
+    SQLite store for GP runs: one row per run (metadata and final metrics) plus one row
+    per generation. Each run is written in a single transaction when it finishes.
+    """
+    def __init__(self, path="gp_results.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)  # Wait for other runs writing to the same file
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, logbook, params=None, dataset=None, seed=None, best_individual=None,
+                   train_fitness=None, val_rmse=None, val_percentage_error=None, started_at=None):
+        """
+        Store a finished run and its per-generation statistics; returns the new run ID.
+        """
+        fitness = logbook.chapters["fitness"] if "fitness" in logbook.chapters else logbook
+        size = logbook.chapters["size"] if "size" in logbook.chapters else None
+        rows = []
+        for i, record in enumerate(logbook):
+            fit = fitness[i]
+            rows.append((
+                record["gen"], record.get("nevals"),
+                _float(fit.get("min")), _float(fit.get("avg")), _float(fit.get("std")), _float(fit.get("max")),
+                _float(size[i].get("avg")) if size else None, _float(size[i].get("max")) if size else None,
+            ))
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started_at, finished_at, seed, dataset, params, generations, stop_reason, "
+                "best_individual, train_fitness, val_rmse, val_percentage_error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at, datetime.now().isoformat(timespec="seconds"), seed, dataset,
+                 json.dumps(params or {}, sort_keys=True), len(logbook) - 1,
+                 logbook[-1].get("stop_reason") if len(logbook) else None,
+                 None if best_individual is None else str(best_individual),
+                 _float(train_fitness), _float(val_rmse), _float(val_percentage_error)),
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO generations (run_id, gen, nevals, fitness_min, fitness_avg, fitness_std, "
+                "fitness_max, size_avg, size_max) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id,) + row for row in rows],
+            )
+        return run_id
+
+    def runs(self, limit=None):
+        """
+        Most recent runs first, as dicts.
+        """
+        query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs ORDER BY run_id DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [dict(zip(RUN_COLUMNS, row)) for row in self.conn.execute(query)]
+
+    def generations(self, run_id):
+        """
+        (gen, fitness_min, fitness_avg, size_avg) rows of one run, in generation order.
+        """
+        return self.conn.execute(
+            "SELECT gen, fitness_min, fitness_avg, size_avg FROM generations WHERE run_id = ? ORDER BY gen",
+            (run_id,),
+        ).fetchall()
+
+    def import_csv(self, csv_path):
+        """
+        Import a legacy rmse_results.csv (Run, Generation, RMSE). A new run starts whenever the
+        run label changes or the generation counter goes back to 0. Returns the number of runs added.
+        """
+        runs = []
+        with open(csv_path, newline="") as f:
+            previous_label = None
+            for row in csv.DictReader(f):
+                gen = int(row["Generation"])
+                if row["Run"] != previous_label or gen == 0:
+                    runs.append([])
+                    previous_label = row["Run"]
+                runs[-1].append((gen, float(row["RMSE"])))
+
+        with self.conn:
+            for history in runs:
+                cursor = self.conn.execute(
+                    "INSERT INTO runs (dataset, params, generations, train_fitness) VALUES (?, ?, ?, ?)",
+                    (f"imported from {csv_path}", "{}", history[-1][0], min(rmse for _, rmse in history)),
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO generations (run_id, gen, fitness_min) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, gen, rmse) for gen, rmse in history],
+                )
+        return len(runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or import GP run results.")
+    parser.add_argument("--db", default="gp_results.sqlite", help="Results database")
+    parser.add_argument("--import-csv", help="Legacy rmse_results.csv file to import")
+    parser.add_argument("--last", type=int, default=10, help="Number of recent runs to list")
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.import_csv:
+            print(f"Imported {store.import_csv(args.import_csv)} runs from {args.import_csv}")
+        for run in store.runs(limit=args.last):
+            print(f"Run {run['run_id']}: {run['generations']} generations, stop={run['stop_reason']}, "
+                  f"train={run['train_fitness']}, val={run['val_rmse']}, dataset={run['dataset']}")
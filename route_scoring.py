@@ -0,0 +1,120 @@
+import random
+import numpy as np
+import pandas as pd
+from deap import base, creator, tools, algorithms
+
+# Terms multiplied by the time, safety, environment and complexity weights, in that order
+FEATURE_NAMES = ["time", "traffic_delay", "distance", "complexity"]
+
+def _column(routes, field):
+    if isinstance(routes, pd.DataFrame):
+        return routes[field].to_numpy(dtype=float)
+    return np.array([route[field] for route in routes], dtype=float)
+
+def route_features(routes, time_field="travel_time"):
+    """
+    (routes x 4) matrix of 1/(time+1), 1/(delay+1), 1/(distance+1) and a constant 1 per route.
+    routes is a list of route dicts or a DataFrame with the same columns.
+    """
+    travel_time = _column(routes, time_field)
+    traffic_delay = _column(routes, "traffic_delay")
+    distance = _column(routes, "distance")
+    return np.column_stack([1 / (travel_time + 1), 1 / (traffic_delay + 1), 1 / (distance + 1),
+                            np.ones(len(routes))])
+
+def route_boosts(routes, environmental_impact, route_complexity):
+    """
+    Tie-breaking multiplier per route: eco routes when the environment matters, shortest for scenic.
+    """
+    types = np.asarray(routes["type"] if isinstance(routes, pd.DataFrame) else [route["type"] for route in routes])
+    boosts = np.ones(len(routes))
+    if environmental_impact > 50:
+        boosts[types == "eco"] = 1.05  # Slight boost for eco-friendly routes
+    if route_complexity == "Scenic and Less Crowded":
+        boosts[types == "shortest"] = 1.02  # Slight boost for scenic routes in case of ties
+    return boosts
+
+# Every feature (1/(x+1) and the constant 1) and every boost is positive, so the boosted sum of
+# route scores grows with each weight and its maximum over [0, 1]^4 is always at the upper corner.
+BEST_WEIGHTS = np.ones(len(FEATURE_NAMES))
+
+# DEAP setup for the genetic algorithm fallback
+creator.create("RouteWeightFitness", base.Fitness, weights=(1.0,))
+creator.create("RouteWeights", list, fitness=creator.RouteWeightFitness)
+
+def optimize_weights_ga(features, boosts, population_size=50, ngen=40, cxpb=0.5, mutpb=0.2, seed=None):
+    """
+    The original genetic algorithm search over the four weights, kept as a fallback.
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    toolbox = base.Toolbox()
+    toolbox.register("attr_float", np.random.uniform, 0, 1)
+    toolbox.register("individual", tools.initRepeat, creator.RouteWeights, toolbox.attr_float, n=4)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("evaluate", lambda individual: (float(boosts @ features @ np.asarray(individual)),))
+    toolbox.register("mate", tools.cxBlend, alpha=0.5)
+    toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=0.1, indpb=0.2)
+    toolbox.register("select", tools.selTournament, tournsize=3)
+
+    population = toolbox.population(n=population_size)
+    for _ in range(ngen):
+        offspring = algorithms.varAnd(population, toolbox, cxpb=cxpb, mutpb=mutpb)
+        fits = toolbox.map(toolbox.evaluate, offspring)
+        for fit, ind in zip(fits, offspring):
+            ind.fitness.values = fit
+        population = toolbox.select(offspring, k=len(population))
+    return np.array(tools.selBest(population, k=1)[0])
+
+def optimize_route_scoring(routes, environmental_impact, route_complexity, time_field="travel_time",
+                           method="exact"):
+    """
+    Best (time, safety, environment, complexity) weights for the routes. The objective is linear
+    with positive coefficients, so the default "exact" method returns BEST_WEIGHTS without a
+    search (zero weights when there are no routes); method="ga" runs the original genetic algorithm.
+    """
+    if method == "ga":
+        features = route_features(routes, time_field)
+        return optimize_weights_ga(features, route_boosts(routes, environmental_impact, route_complexity))
+    return BEST_WEIGHTS.copy() if len(routes) else np.zeros(len(FEATURE_NAMES))
+
+def preference_multiplier(traffic_vs_time, safety_vs_speed, environmental_impact, route_complexity):
+    """
+    Factor that apply_user_preferences scales every prediction by.
+    """
+    multiplier = 1.0
+
+    # First apply the main trade-offs
+    if traffic_vs_time == "Minimize Time":
+        multiplier *= 1.1  # Slightly prioritize time minimization
+    elif traffic_vs_time == "Avoid Traffic":
+        multiplier *= 0.9
+
+    if safety_vs_speed == "Faster Routes":
+        multiplier *= 0.95
+    elif safety_vs_speed == "Safer Routes":
+        multiplier *= 1.05
+
+    if environmental_impact > 50:
+        multiplier *= 0.85  # Prioritize eco-friendly routes
+
+    # Apply secondary criteria based on route complexity
+    if route_complexity == "Scenic and Less Crowded":
+        multiplier *= 1.05  # Slightly prioritize scenic routes if chosen
+
+    return multiplier
+
+def score_route_table(routes, traffic_vs_time, safety_vs_speed, environmental_impact, route_complexity,
+                      time_field="adjusted_travel_time"):
+    """
+    optimize_route_scoring and apply_user_preferences for many O/D pairs at once. Every pair
+    has at least one route, so each route gets BEST_WEIGHTS and its Score in one vectorized pass.
+    """
+    features = route_features(routes, time_field)
+    weights = np.broadcast_to(BEST_WEIGHTS, features.shape)
+
+    multiplier = preference_multiplier(traffic_vs_time, safety_vs_speed, environmental_impact, route_complexity)
+    routes = routes.assign(**{f"weight_{name}": weights[:, i] for i, name in enumerate(FEATURE_NAMES)})
+    routes["Score"] = ((features * weights).sum(axis=1) * multiplier).round(4)
+    return routes
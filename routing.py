@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from api_client import get_client, ApiRequestError
+from geometry import points_array
+
+ROUTING_URL = "https://api.tomtom.com/routing/1/calculateRoute/{start}:{end}/json"
+ROUTE_TYPES = ["fastest", "shortest", "eco"]
+REQUEST_TIMEOUT = 10  # Seconds allowed for each route request
+
+# Route cache settings
+COORD_PRECISION = 3  # Decimal places kept from origin/destination (about 100 m)
+TIME_BUCKET_MINUTES = 30  # Routes are cached per half hour of the day
+TRAFFIC_TTL = 120  # Seconds before travel time and delay are refreshed
+GEOMETRY_TTL = 7 * 24 * 3600  # Seconds before the route itself is downloaded again
+
+# Fields that change with live traffic; everything else is treated as geometry
+TRAFFIC_FIELDS = ("travel_time", "traffic_delay")
+
+# Shared by all sessions so route requests for one click go out in parallel
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="routing")
+
+def parse_route(route_type, route, alternative=0):
+    route_summary = route.get("summary", {})
+    route_points = route.get("legs", [{}])[0].get("points", [])
+    return {
+        "type": route_type,
+        "alternative": alternative,
+        "distance": route_summary.get("lengthInMeters", 0) / 1609.344,  # Convert meters to miles
+        "travel_time": route_summary.get("travelTimeInSeconds", 0) // 60,  # Convert seconds to minutes
+        "traffic_delay": route_summary.get("trafficDelayInSeconds", 0) // 60,  # Convert seconds to minutes
+        "points": points_array([(point['latitude'], point['longitude']) for point in route_points])
+    }
+
+class RouteCache:
+    """
+    Process-wide cache of parsed routes keyed by rounded origin/destination, route type,
+    number of alternatives and time-of-day bucket. Geometry is kept for geometry_ttl seconds,
+    but travel time and delay only for traffic_ttl; after that a cheap summary-only request
+    refreshes them. Callers always get copies, so they can annotate routes freely.
+    """
+    def __init__(self, maxsize=2048, precision=COORD_PRECISION, bucket_minutes=TIME_BUCKET_MINUTES,
+                 traffic_ttl=TRAFFIC_TTL, geometry_ttl=GEOMETRY_TTL):
+        self.maxsize = maxsize
+        self.precision = precision
+        self.bucket_minutes = bucket_minutes
+        self.traffic_ttl = traffic_ttl
+        self.geometry_ttl = geometry_ttl
+        self.hits = 0
+        self.traffic_refreshes = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> [routes, geometry fetched at, traffic fetched at]
+        self._lock = threading.Lock()
+
+    def key(self, start_coords, end_coords, route_type, max_alternatives=0, now=None):
+        local_time = time.localtime(now)
+        bucket = (local_time.tm_hour * 60 + local_time.tm_min) // self.bucket_minutes
+        return (tuple(round(c, self.precision) for c in start_coords),
+                tuple(round(c, self.precision) for c in end_coords),
+                route_type, max_alternatives, bucket)
+
+    def lookup(self, key):
+        """
+        (routes, state) where state is "fresh", "stale_traffic" (geometry still valid) or None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[1] >= self.geometry_ttl:
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(key)
+            routes = [dict(route) for route in entry[0]]
+            if now - entry[2] < self.traffic_ttl:
+                self.hits += 1
+                return routes, "fresh"
+            self.traffic_refreshes += 1
+            return routes, "stale_traffic"
+
+    def put(self, key, routes):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = [[dict(route) for route in routes], now, now]
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)  # Evict the least recently used corridor
+
+    def update_traffic(self, key, summaries):
+        """
+        Replace the traffic fields of a cached entry with those of freshly fetched summaries.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            for route, summary in zip(entry[0], summaries):
+                for field in TRAFFIC_FIELDS:
+                    route[field] = summary[field]
+            entry[2] = time.time()
+
+    def stats(self):
+        lookups = self.hits + self.traffic_refreshes + self.misses
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                "traffic_refreshes": self.traffic_refreshes, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+# Shared by all Streamlit sessions in this process
+route_cache = RouteCache()
+
+def download_route_type(start_coords, end_coords, route_type, api_key, max_alternatives=0,
+                        timeout=REQUEST_TIMEOUT, summary_only=False):
+    """
+    Request one route type; returns the main route followed by any alternatives.
+    With summary_only the route points are left out of the response (and of the result).
+    """
+    url = ROUTING_URL.format(start=",".join(map(str, start_coords)), end=",".join(map(str, end_coords)))
+    params = {"key": api_key, "travelMode": "car", "routeType": route_type}
+    if max_alternatives:
+        params["maxAlternatives"] = max_alternatives
+    if summary_only:
+        params["routeRepresentation"] = "summaryOnly"
+    try:
+        response = get_client().get(url, params=params, endpoint="routing", timeout=timeout)
+    except ApiRequestError as e:
+        raise RuntimeError(f"Error fetching {route_type} route: {e}") from e
+    if response.status_code != 200:
+        raise RuntimeError(f"API Error for {route_type} route: {response.status_code} - {response.text}")
+    route_data = response.json()
+    return [parse_route(route_type, route, i) for i, route in enumerate(route_data.get("routes", [{}]))]
+
+def fetch_route_type(start_coords, end_coords, route_type, api_key, max_alternatives=0,
+                     timeout=REQUEST_TIMEOUT, cache=None):
+    """
+    download_route_type through the route cache: fresh entries are returned directly and
+    entries with stale traffic only have their travel time and delay refreshed.
+    """
+    if cache is None:
+        return download_route_type(start_coords, end_coords, route_type, api_key, max_alternatives, timeout)
+
+    key = cache.key(start_coords, end_coords, route_type, max_alternatives)
+    routes, state = cache.lookup(key)
+    if state == "fresh":
+        return routes
+    if state == "stale_traffic":
+        summaries = download_route_type(start_coords, end_coords, route_type, api_key, max_alternatives,
+                                        timeout, summary_only=True)
+        if len(summaries) == len(routes):
+            cache.update_traffic(key, summaries)
+            for route, summary in zip(routes, summaries):
+                for field in TRAFFIC_FIELDS:
+                    route[field] = summary[field]
+            return routes
+
+    routes = download_route_type(start_coords, end_coords, route_type, api_key, max_alternatives, timeout)
+    cache.put(key, routes)
+    return routes
+
+def request_routes(start_coords, end_coords, api_key, route_types=ROUTE_TYPES, max_alternatives=0,
+                   timeout=REQUEST_TIMEOUT, cache=route_cache):
+    """
+    Request all route types at once, so the wait is one round trip rather than one per type.
+    Returns (routes, errors): routes in route_types order for the requests that succeeded
+    within the timeout, and a message for each one that failed or timed out.
+    Pass cache=None to bypass the shared route cache.
+    """
+    futures = {
+        route_type: _executor.submit(fetch_route_type, start_coords, end_coords, route_type, api_key,
+                                     max_alternatives, timeout, cache)
+        for route_type in route_types
+    }
+    wait(futures.values(), timeout=timeout)
+
+    routes, errors = [], []
+    for route_type, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors.append(f"Timed out fetching {route_type} route after {timeout} seconds")
+        elif future.exception() is not None:
+            errors.append(str(future.exception()))
+        else:
+            routes.extend(future.result())
+    return routes, errors
@@ -0,0 +1,308 @@
+import operator
+import random
+import math
+import multiprocessing
+from collections import OrderedDict
+from functools import partial
+import numpy as np
+from deap import base, creator, tools, gp
+
+# Penalty added per tree node to discourage overly complex models (parsimony pressure)
+COMPLEXITY_PENALTY = 0.005
+
+# Koza's static limit on tree height; keeps compile and evaluation cost bounded
+MAX_TREE_HEIGHT = 17
+
+# Scalar primitives (one inbound value at a time)
+def safe_div(x, y):
+    return x / y if y != 0 else 1
+
+def safe_log(x):
+    return math.log(x) if x > 0 else 0
+
+# Array-safe primitives, element-wise equivalents of the scalar versions above
+def safe_div_array(x, y):
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    return np.divide(x, y, out=np.ones(x.shape), where=y != 0)
+
+def safe_log_array(x):
+    x = np.asarray(x, dtype=np.float64)
+    return np.log(x, out=np.zeros(x.shape), where=x > 0)
+
+# Primitive name -> implementation used when a tree is evaluated over whole arrays
+ARRAY_PRIMITIVES = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "neg": np.negative,
+    "safe_div": safe_div_array,
+    "safe_log": safe_log_array,
+}
+
+# Genetic programming components
+pset = gp.PrimitiveSet("MAIN", 1)  # 1 input: inbound vehicles
+pset.addPrimitive(operator.add, 2)
+pset.addPrimitive(operator.sub, 2)
+pset.addPrimitive(operator.mul, 2)
+pset.addPrimitive(operator.neg, 1)
+pset.addPrimitive(safe_div, 2)
+pset.addPrimitive(safe_log, 1)
+pset.addEphemeralConstant("rand", partial(random.uniform, -0.5, 0.5))  # partial keeps individuals picklable
+pset.renameArguments(ARG0="inbound_vehicles")
+creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+creator.create("Individual", gp.PrimitiveTree, fitness=creator.FitnessMin)
+
+# Primitives whose argument order does not change the result
+COMMUTATIVE_PRIMITIVES = {"add", "mul"}
+
+def canonical_form(tree):
+    """
+    String form of a tree with the arguments of commutative primitives sorted,
+    so structurally identical trees (e.g. add(x, 1) and add(1, x)) share one key.
+    """
+    stack = []
+    for node in reversed(tree):
+        if isinstance(node, gp.Primitive):
+            args = [stack.pop() for _ in range(node.arity)]
+            if node.name in COMMUTATIVE_PRIMITIVES:
+                args.sort()
+            stack.append("{name}({args})".format(name=node.name, args=", ".join(args)))
+        else:
+            stack.append(node.format())
+    return stack[0]
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping with hit/miss counters.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)  # Evict the least recently used entry
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "hit_rate": round(self.hit_rate, 4)}
+
+class TreeCompiler:
+    """
+    Compiles trees into nested Python closures instead of building and eval-ing source code.
+    Every subtree is memoized by its canonical form, so when crossover or mutation changes
+    one branch only the nodes above it are rebuilt; the rest are reused as-is.
+    """
+    def __init__(self, primitives, maxsize=200000):
+        self.primitives = primitives
+        self.cache = LRUCache(maxsize)
+        self._arg_index = {name: i for i, name in enumerate(pset.arguments)}
+
+    def __call__(self, expr):
+        root = self._compile_tree(expr)
+        return lambda *args: root(args)
+
+    def _compile_tree(self, tree):
+        stack = []  # (canonical key, node function) for each pending subtree
+        for node in reversed(tree):
+            if isinstance(node, gp.Primitive):
+                children = [stack.pop() for _ in range(node.arity)]
+                if node.name in COMMUTATIVE_PRIMITIVES:
+                    children.sort(key=operator.itemgetter(0))
+                key = "{name}({args})".format(name=node.name, args=", ".join(k for k, _ in children))
+                func = self.cache.get(key)
+                if func is None:
+                    func = self._primitive_node(self.primitives[node.name], [f for _, f in children])
+                    self.cache.put(key, func)
+            else:
+                key = node.format()
+                func = self._terminal_node(node)
+            stack.append((key, func))
+        return stack[0][1]
+
+    def _terminal_node(self, node):
+        if isinstance(node.value, str) and node.value in self._arg_index:
+            return operator.itemgetter(self._arg_index[node.value])
+        value = pset.context[node.value] if isinstance(node.value, str) else node.value
+        return lambda args: value
+
+    @staticmethod
+    def _primitive_node(op, children):
+        if len(children) == 1:
+            child, = children
+            return lambda args: op(child(args))
+        if len(children) == 2:
+            left, right = children
+            return lambda args: op(left(args), right(args))
+        return lambda args: op(*[child(args) for child in children])
+
+# One compiler (and subtree cache) per process for the vectorized mode; with one array call
+# per node the closure overhead is negligible there, unlike per-sample scalar evaluation
+vector_compiler = TreeCompiler(ARRAY_PRIMITIVES)
+
+# gp.compile callables per canonical tree form, for the scalar mode
+scalar_cache = LRUCache(50000)
+
+def compile_vectorized(expr):
+    """
+    Compile a tree into a function that takes whole NumPy arrays instead of single values.
+    """
+    return vector_compiler(expr)
+
+def compile_scalar(expr):
+    """
+    gp.compile(expr, pset), memoized by canonical form so repeated trees are only compiled once.
+    """
+    key = canonical_form(expr)
+    func = scalar_cache.get(key)
+    if func is None:
+        func = gp.compile(expr, pset)
+        scalar_cache.put(key, func)
+    return func
+
+def evaluate_scalar(individual, inbound, outbound, penalty=COMPLEXITY_PENALTY):
+    """
+    Penalized RMSE of an individual, calling the compiled tree once per (inbound, outbound) pair.
+    """
+    func = compile_scalar(individual)
+    errors = [(func(x) - y) ** 2 for x, y in zip(inbound, outbound)]
+    rmse = np.sqrt(sum(errors) / len(errors))
+    complexity_penalty = len(individual) * penalty  # Penalize tree complexity
+    return rmse + complexity_penalty,  # Penalized RMSE
+
+def evaluate_vectorized(individual, inbound, outbound, penalty=COMPLEXITY_PENALTY):
+    """
+    Penalized RMSE of an individual, computed in one batched pass over the arrays.
+    """
+    func = compile_vectorized(individual)
+    with np.errstate(all="ignore"):
+        errors = func(inbound) - outbound
+        rmse = np.sqrt(np.mean(errors ** 2))
+    complexity_penalty = len(individual) * penalty  # Penalize tree complexity
+    return float(rmse) + complexity_penalty,  # Penalized RMSE
+
+class FitnessCache(LRUCache):
+    """
+    Bounded LRU cache of fitness values keyed by dataset name and canonical tree form.
+    """
+    def __init__(self, maxsize=50000):
+        super().__init__(maxsize)
+
+    def map(self, evaluate, individuals, map_func=map, dataset="train"):
+        """
+        Drop-in replacement for toolbox.map: only trees not seen before (and only one
+        copy of each) are passed on to map_func for scoring.
+        """
+        results = [None] * len(individuals)
+        pending = OrderedDict()  # key -> indices of the individuals waiting for it
+        for i, individual in enumerate(individuals):
+            key = (dataset, canonical_form(individual))
+            if key in pending:
+                self.hits += 1  # Duplicate within this batch, scored once below
+                pending[key].append(i)
+                continue
+            value = self.get(key)
+            if value is None:
+                pending[key] = [i]
+            else:
+                results[i] = value
+
+        unique = [individuals[indices[0]] for indices in pending.values()]
+        for (key, indices), value in zip(pending.items(), map_func(evaluate, unique)):
+            self.put(key, value)
+            for i in indices:
+                results[i] = value
+        return results
+
+def build_toolbox(max_height=MAX_TREE_HEIGHT, max_size=None, selection="tournament", tournsize=3,
+                  parsimony_size=1.4):
+    """
+    Toolbox with the GP operators; evaluation reads the training data set by init_worker.
+    Offspring of mate/mutate that exceed max_height (or max_size nodes) are replaced by a parent.
+    selection is "tournament" or "double_tournament" (fitness tournament, then a size tournament
+    that prefers the smaller tree with probability parsimony_size / 2).
+    """
+    toolbox = base.Toolbox()
+    toolbox.register("expr", gp.genHalfAndHalf, pset=pset, min_=1, max_=3)
+    toolbox.register("individual", tools.initIterate, creator.Individual, toolbox.expr)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("compile", compile_scalar)
+    toolbox.register("evaluate", evaluate_training)
+    if selection == "double_tournament":
+        toolbox.register("select", tools.selDoubleTournament, fitness_size=tournsize,
+                         parsimony_size=parsimony_size, fitness_first=True)
+    else:
+        toolbox.register("select", tools.selTournament, tournsize=tournsize)
+    toolbox.register("mate", gp.cxOnePoint)
+    toolbox.register("expr_mut", gp.genFull, min_=2, max_=4)
+    toolbox.register("mutate", gp.mutUniform, expr=toolbox.expr_mut, pset=pset)
+
+    # Bloat control
+    toolbox.decorate("mate", gp.staticLimit(key=operator.attrgetter("height"), max_value=max_height))
+    toolbox.decorate("mutate", gp.staticLimit(key=operator.attrgetter("height"), max_value=max_height))
+    if max_size is not None:
+        toolbox.decorate("mate", gp.staticLimit(key=len, max_value=max_size))
+        toolbox.decorate("mutate", gp.staticLimit(key=len, max_value=max_size))
+    return toolbox
+
+def build_stats():
+    """
+    Per-generation statistics on fitness and on tree size (number of nodes).
+    """
+    stats_fit = tools.Statistics(lambda ind: ind.fitness.values)
+    stats_size = tools.Statistics(len)
+    stats = tools.MultiStatistics(fitness=stats_fit, size=stats_size)
+    stats.register("avg", np.mean)
+    stats.register("std", np.std)
+    stats.register("min", np.min)
+    stats.register("max", np.max)
+    return stats
+
+EVALUATORS = {
+    "vectorized": evaluate_vectorized,
+    "scalar": evaluate_scalar,
+}
+
+# Training data held by each evaluation process, set once by init_worker
+_training = {}
+
+def init_worker(inbound, outbound, mode="vectorized", penalty=COMPLEXITY_PENALTY):
+    """
+    Store the training data in this process so tasks only need to carry the individual.
+    The data is kept as float32 but evaluated in float64, so every primitive works at full
+    precision and fitness values match the float64 gp.compile baseline.
+    """
+    _training["evaluate"] = EVALUATORS[mode]
+    _training["inbound"] = np.asarray(inbound, dtype=np.float64)
+    _training["outbound"] = np.asarray(outbound, dtype=np.float64)
+    _training["penalty"] = penalty
+
+def evaluate_training(individual):
+    return _training["evaluate"](individual, _training["inbound"], _training["outbound"], _training["penalty"])
+
+def create_pool(processes, inbound, outbound, mode="vectorized", penalty=COMPLEXITY_PENALTY):
+    """
+    Process pool whose workers receive the training data once, at start-up.
+    """
+    return multiprocessing.Pool(processes, initializer=init_worker, initargs=(inbound, outbound, mode, penalty))
@@ -1,11 +1,13 @@
 import random
+import time
 import numpy as np
-import requests
 import folium
+from folium.plugins import FastMarkerCluster
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from geopy.geocoders import Nominatim
+from incident_data import normalize_bbox, IncidentTable, IncidentColumns, incidents_geojson, start_points
+from geocoding import get_geocoder
 from streamlit_folium import st_folium
 import pandas as pd
 import plotly.express as px
@@ -16,52 +18,12 @@ load_dotenv()
 # Fetch the API key securely
 API_KEY = os.getenv("TOMTOM_API_KEY2")
 
-# Define the base URL for TomTom Traffic Incident API
-TRAFFIC_INCIDENT_URL = "https://api.tomtom.com/traffic/services/5/incidentDetails"
-
-# Initialize geolocator for Geopy
-geolocator = Nominatim(user_agent="traffic_incident_app")
-
-# Define Icon Categories for Mapping
-ICON_CATEGORY_MAP = {
-    1: "Accident",
-    8: "Road Closed",
-    6: "Jam",
-    0: "Unknown",
-    2: "Fog",
-    3: "DangerousConditions",
-    4: "Rain",
-    5: "Ice",
-    7: "LaneClosed",
-    9: "RoadWorks",
-    10: "Wind",
-    11: "Flooding",
-    14: "BrokenDownVehicle"
-}
-
-# Define color mapping for different incidents
-ICON_COLOR_MAP = {
-    "Accident": "red",
-    "Road Closed": "black",
-    "Jam": "orange",
-    "Fog": "gray",
-    "DangerousConditions": "purple",
-    "Rain": "blue",
-    "Ice": "blue",
-    "LaneClosed": "green",
-    "RoadWorks": "yellow",
-    "Wind": "brown",
-    "Flooding": "cyan",
-    "BrokenDownVehicle": "magenta",
-    "Unknown": "gray"
-}
-
 # ✅ Function to get location coordinates safely
 def get_location_coordinates(location_name):
     try:
-        location = geolocator.geocode(location_name, exactly_one=True)
-        if location:
-            return location.latitude, location.longitude
+        coords = get_geocoder().geocode(location_name)  # Cached; only new places reach Nominatim
+        if coords:
+            return coords
         else:
             st.error(f"⚠️ Unable to find coordinates for {location_name}. Check the city name.")
             return None, None
@@ -69,61 +31,76 @@ def get_location_coordinates(location_name):
         st.error(f"⚠️ Geocoding Error: {e}")
         return None, None
 
-# ✅ Function to fetch traffic incidents (real-time data fetch from TomTom)
-def fetch_traffic_incidents(api_key, start_lat, start_lon, end_lat, end_lon):
-    bbox = f"{start_lon},{start_lat},{end_lon},{end_lat}"  
-    params = {
-        "key": api_key,  
-        "bbox": bbox,  
-        "t": "1740485980",  
-    }
-    
-    try:
-        response = requests.get(TRAFFIC_INCIDENT_URL, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"🚨 Error fetching traffic incidents: {response.status_code} - {response.text}")
-            return None
-    except Exception as e:
-        st.error(f"🚨 Error fetching traffic incidents: {e}")
-        return None
+# ✅ Function to poll traffic incidents (real-time data fetch from TomTom)
+def poll_traffic_incidents(table):
+    # Only refetches when the traffic model has changed; failed tiles are reported, the rest still shown
+    delta, errors = table.poll()
+    for error in errors:
+        st.error(f"🚨 {error}")
+    return delta
 
 # ✅ Function to clean and process incident data (for real-time data)
 def clean_data(traffic_incidents):
+    # Columnar: categorical type and color, numeric severity and one flat coordinate array
     if traffic_incidents is None:
-        return []
-
-    cleaned_incidents = []
-    incidents = traffic_incidents.get('incidents', [])
-
-    if not incidents:
-        return []
-
-    for incident in incidents:
-        properties = incident.get('properties', {})
-        geometry = incident.get('geometry', {})
-
-        icon_category = properties.get('iconCategory', 'Unknown')
-        description = ICON_CATEGORY_MAP.get(icon_category, 'Unknown')
-
-        severity = properties.get('magnitudeOfDelay') or properties.get('delay') or properties.get('impact') or "Not Reported"
-
-        coordinates = geometry.get('coordinates', [])
-        if not coordinates:
-            continue
-
-        incident_data = {
-            'iconCategory': icon_category,
-            'type': description,
-            'severity': severity,
-            'coordinates': coordinates,
-            'color': ICON_COLOR_MAP.get(description, 'gray')  
-        }
+        return IncidentColumns.from_incidents([])
+    return IncidentColumns.from_incidents(traffic_incidents.get('incidents', []))
+
+# Markers for incident start points are built in the browser from one data array
+START_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: L.AwesomeMarkers.icon({markerColor: row[3]})});
+    marker.bindPopup("🚦 Type: " + row[2]);
+    return marker;
+}
+"""
+
+# ✅ Function to style incident lines by category
+def incident_style(feature):
+    return {"color": feature["properties"]["color"], "weight": 4, "opacity": 0.8}
+
+# ✅ Function to apply a poll's changes to the cleaned incidents and the map
+def update_incident_map(table, delta):
+    # Nothing is redrawn when a poll found no changes
+    if not any(delta.values()) and st.session_state["traffic_map"] is not None:
+        return
+
+    cleaned_incidents = clean_data({"incidents": list(table.incidents.values())})
+
+    # ✅ Create a Folium map centered at the start location
+    traffic_map = folium.Map(location=st.session_state["map_location"], zoom_start=12)
+
+    # ✅ All incident lines as one GeoJSON layer, and the start points as one marker cluster
+    lines = incidents_geojson(cleaned_incidents)
+    if lines["features"]:  # The tooltip needs at least one feature with its fields
+        folium.GeoJson(
+            lines,
+            name="Incidents",
+            style_function=incident_style,
+            tooltip=folium.GeoJsonTooltip(fields=["type", "severity"], aliases=["🚦 Type", "Severity"])
+        ).add_to(traffic_map)
+    FastMarkerCluster(start_points(cleaned_incidents), callback=START_MARKER_CALLBACK,
+                      name="Incident Markers").add_to(traffic_map)
+
+    st.session_state["traffic_map"] = traffic_map  # ✅ Save map in session state
+    st.session_state["cleaned_incidents"] = cleaned_incidents  # Store cleaned incidents for statistics
+    st.session_state["total_incidents"] = len(cleaned_incidents)  # ✅ Store incident count
+
+# ✅ Function to show the incident count and map; reruns on its own every poll interval with live updates
+def incident_map_view(live_updates, poll_interval):
+    # 🔄 Poll for changes when the interval has passed (run_every can fire slightly early)
+    table = st.session_state["incident_table"]
+    if live_updates and table is not None and time.time() - table.polled_at >= poll_interval - 1:
+        delta = poll_traffic_incidents(table)
+        update_incident_map(table, delta)
 
-        cleaned_incidents.append(incident_data)
+    # ✅ Display Persistent Incident Count (simulated count)
+    if st.session_state["total_incidents"] is not None:
+        st.subheader(f"🚧 **Total Incidents Reported:** {st.session_state['total_incidents']}")
 
-    return cleaned_incidents
+    # ✅ Display the updated traffic map
+    if st.session_state["traffic_map"]:
+        st_folium(st.session_state["traffic_map"], width=700, height=500)
 
 # Simulated statistics calculation functions
 def calculate_average_accident_rate():
@@ -156,6 +133,10 @@ def incident():
     start_date = st.sidebar.date_input("From Date", pd.to_datetime('2023-01-01'))
     end_date = st.sidebar.date_input("To Date", pd.to_datetime('2023-01-31'))
 
+    # ✅ Live updates poll for changes instead of refetching everything
+    live_updates = st.sidebar.checkbox("🔄 Live Updates", value=False)
+    poll_interval = st.sidebar.slider("Poll Interval (seconds)", 30, 300, 60)
+
     # ✅ Initialize session state for the traffic map & incident count
     if "traffic_map" not in st.session_state:
         st.session_state["traffic_map"] = None
@@ -163,6 +144,8 @@ def incident():
         st.session_state["total_incidents"] = None
     if "cleaned_incidents" not in st.session_state:
         st.session_state["cleaned_incidents"] = None
+    if "incident_table" not in st.session_state:
+        st.session_state["incident_table"] = None
 
     # 🚀 Fetch Traffic Data Button (real-time traffic incidents)
     if st.sidebar.button("🚨 Fetch Traffic Incidents"):
@@ -170,44 +153,22 @@ def incident():
         end_lat, end_lon = get_location_coordinates(end_location)
 
         if start_lat and start_lon and end_lat and end_lon:
-            # ✅ Fetch real-time traffic incidents
-            traffic_incidents = fetch_traffic_incidents(API_KEY, start_lat, start_lon, end_lat, end_lon)
-
-            if traffic_incidents:
-                cleaned_incidents = clean_data(traffic_incidents)
-                st.session_state["total_incidents"] = len(cleaned_incidents)  # ✅ Store incident count
-                st.session_state["cleaned_incidents"] = cleaned_incidents  # Store cleaned incidents for statistics
-
-                # ✅ Create a Folium map centered at the start location
-                traffic_map = folium.Map(location=[start_lat, start_lon], zoom_start=12)
-
-                # ✅ Add markers and polylines with different colors for each type
-                for incident in cleaned_incidents:
-                    for coord in incident['coordinates']:
-                        lat, lon = coord[1], coord[0]
-                        folium.PolyLine([(lat, lon)], color=incident['color'], weight=2.5, opacity=1).add_to(traffic_map)
+            # ✅ Fetch real-time traffic incidents into a new incident table
+            table = IncidentTable(normalize_bbox(start_lat, start_lon, end_lat, end_lon), API_KEY)
+            delta = poll_traffic_incidents(table)
 
-                    first_coord = incident['coordinates'][0]
-                    folium.Marker(
-                        [first_coord[1], first_coord[0]],
-                        popup=f"🚦 Type: {incident['type']}",
-                        icon=folium.Icon(color=incident['color'])
-                    ).add_to(traffic_map)
-
-                # ✅ Save map in session state
-                st.session_state["traffic_map"] = traffic_map
+            if table.fetched_at is not None:
+                st.session_state["map_location"] = [start_lat, start_lon]
+                st.session_state["incident_table"] = table
+                st.session_state["traffic_map"] = None
+                update_incident_map(table, delta)
 
                 # **Simulate and display statistics for multiple selected types**
                 statistic_values_list = simulate_statistics(statistic_types, start_location, end_location, start_date, end_date)
                 display_multiple_bar_charts(statistic_values_list, start_date, end_date)
 
-    # ✅ Display Persistent Incident Count (simulated count)
-    if st.session_state["total_incidents"] is not None:
-        st.subheader(f"🚧 **Total Incidents Reported:** {st.session_state['total_incidents']}")
-
-    # ✅ Display the updated traffic map
-    if st.session_state["traffic_map"]:
-        st_folium(st.session_state["traffic_map"], width=700, height=500)
+    # ✅ Incident count and map; with live updates only this part reruns, without blocking the page
+    st.fragment(incident_map_view, run_every=poll_interval if live_updates else None)(live_updates, poll_interval)
 
     # ✅ Display the bar chart if it exists in session state
     if "bar_chart" in st.session_state: